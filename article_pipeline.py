@@ -0,0 +1,125 @@
+import contextlib
+import multiprocessing
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import requests
+from newspaper import Article, Config
+
+# ニュース記事の本文を並列で取ってくるパイプライン
+# ダウンロードはスレッド、lxmlでの解析は別プロセスで行い、抽出した本文はURLごとに一定時間キャッシュする
+
+# Chromeブラウザのふりをする設定
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# 記事のサイトへ転送するだけのホスト（Google News のリンクなど）。ここは同時接続数を制限しない
+REDIRECT_HOSTS = {"news.google.com"}
+MAX_REDIRECTS = 10
+
+_config = Config()
+_config.browser_user_agent = USER_AGENT
+
+
+def parse_article(url, html):
+    """ダウンロード済みのHTMLから本文を抜き出す（ワーカープロセスで動く）"""
+    article = Article(url, config=_config)
+    article.download(input_html=html)
+    article.parse()
+    return article.text
+
+
+class TTLCache:
+    """URL → 本文 を ttl 秒だけ覚えておく、スレッドセーフな簡易キャッシュ"""
+
+    def __init__(self, ttl=3600, max_items=1000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._items) >= self.max_items:
+                # いっぱいになったら一番古いものから捨てる
+                del self._items[next(iter(self._items))]
+            self._items[key] = (time.monotonic() + self.ttl, value)
+
+
+class ArticlePipeline:
+    """記事URLのリストを受け取り、本文が取れたものから順に返す
+
+    extract() は (URL, 本文, 例外) を完了した順に返すジェネレーター。
+    同じサイトへの同時接続数は per_host まで、1記事の通信は timeout 秒までに制限する。
+    リダイレクトは1つずつたどり、転送先（記事のあるサイト）のホストごとに制限する。
+    """
+
+    def __init__(self, max_workers=8, per_host=2, timeout=10, ttl=3600, parse_workers=2):
+        self.timeout = timeout
+        self.per_host = per_host
+        self.cache = TTLCache(ttl=ttl)
+        self._downloads = ThreadPoolExecutor(max_workers=max_workers)
+        # Streamlitはマルチスレッドで動いているので、forkではなくspawnでプロセスを作る
+        self._parsers = ProcessPoolExecutor(max_workers=parse_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = USER_AGENT
+
+    def _host_limit(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host in REDIRECT_HOSTS:
+            return contextlib.nullcontext()
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _get(self, url):
+        # 自動でリダイレクトさせると、転送元のホストの枠を持ったまま記事のサイトに接続してしまうので、自分でたどる
+        for _ in range(MAX_REDIRECTS + 1):
+            with self._host_limit(url):
+                response = self._session.get(url, timeout=self.timeout, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            url = urllib.parse.urljoin(response.url, response.headers["Location"])
+        raise requests.TooManyRedirects(f"リダイレクトが{MAX_REDIRECTS}回を超えました: {url}")
+
+    def _fetch(self, url):
+        response = self._get(url)
+        response.raise_for_status()
+        # 解析はCPUを使うので、別プロセスに回してGILを取り合わないようにする
+        text = self._parsers.submit(parse_article, response.url, response.text).result(timeout=self.timeout)
+        self.cache.set(url, text)
+        return text
+
+    def extract(self, urls):
+        cached = []
+        pending = {}
+        for url in dict.fromkeys(urls):
+            text = self.cache.get(url)
+            if text is not None:
+                cached.append((url, text))
+            else:
+                pending[self._downloads.submit(self._fetch, url)] = url
+
+        for url, text in cached:
+            yield url, text, None
+        for future in as_completed(pending):
+            if future.exception() is not None:
+                yield pending[future], None, future.exception()
+            else:
+                yield pending[future], future.result(), None
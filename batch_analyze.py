@@ -0,0 +1,199 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import pipeline
+from forecast import DEFAULT_CACHE_DIR as FORECAST_CACHE_DIR
+from fundamentals import FundamentalsCache
+from price_store import PriceStore
+from universe import load_universe
+
+# 画面を開かずに分析をまとめて実行し、レポートをファイルに書き出すコマンド
+# 夜間に流しておけば、株価・決算・AI予測のキャッシュも温まるので画面側の表示も速くなる
+#
+#   python batch_analyze.py 7203.T 6758.T AAPL --out reports
+#   python batch_analyze.py --all --workers 8 --format csv --resume
+#
+# 出力（--out のフォルダ内）
+#   prices/<コード>.parquet      株価 + RSI / 25MA / 75MA
+#   financials/<コード>.parquet  決算の推移
+#   forecast/<コード>.parquet    AI予測
+#   summary/<コード>.parquet     1銘柄1行のまとめ（これがあれば完了済みとみなす）
+#   summary.parquet             全銘柄のまとめ
+#   growth.parquet / correlation.parquet / mean_correlation.parquet  比較モードと同じ成長率と相関
+#     （銘柄数が --compare-max 以下のときだけ。--all では作らない）
+
+INTERVALS = ["1d", "1wk", "1mo"]
+
+# 相関の計算（並べ替えと平均相関の推移）は銘柄数の2乗〜3乗で重くなり、
+# 数千銘柄の相関行列は人が読める表にもならないので、比較レポートは少数の銘柄に限る
+COMPARE_MAX_TICKERS = 100
+
+# ワーカープロセスごとに1つずつ作る（SQLiteの接続やキャッシュはプロセスをまたいで渡せないため）
+_store = None
+_fundamentals = None
+
+
+def _init_worker(db_path, fundamentals_dir):
+    global _store, _fundamentals
+    _store = PriceStore(db_path)
+    _fundamentals = FundamentalsCache(fundamentals_dir)
+
+
+def _safe_name(ticker):
+    return re.sub(r"[^0-9A-Za-z._-]", "_", ticker)
+
+
+def report_path(out_dir, kind, ticker, fmt):
+    return os.path.join(out_dir, kind, f"{_safe_name(ticker)}.{fmt}")
+
+
+def write_frame(df, path, fmt):
+    """途中で止まっても壊れたファイルが残らないように、一時ファイルに書いてから置き換える"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp_path)
+    else:
+        df.to_csv(tmp_path, encoding="utf-8-sig")
+    os.replace(tmp_path, path)
+
+
+def read_frame(path, fmt):
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path, index_col=0, encoding="utf-8-sig")
+
+
+def analyze_ticker(ticker, name, options):
+    """1銘柄分の分析を行い、レポートを書き出す（ワーカープロセスで動く）"""
+    out_dir, fmt = options["out"], options["format"]
+    start_date, end_date = pipeline.date_range(options["years"])
+    df = pipeline.load_price_frame(_store, ticker, start_date, end_date, options["interval"])
+    if len(df) == 0:
+        raise ValueError("株価データなし")
+    write_frame(df, report_path(out_dir, "prices", ticker, fmt), fmt)
+
+    # 企業情報・決算は取れなくても株価のレポートは残す
+    info = None
+    if not options["skip_fundamentals"]:
+        try:
+            info = _fundamentals.get_info(ticker)
+            financials = _fundamentals.get_financials(ticker)
+            if financials is not None and not financials.empty:
+                write_frame(pipeline.financials_frame(financials), report_path(out_dir, "financials", ticker, fmt), fmt)
+        except Exception:
+            info = info or {}
+
+    forecast_df = None
+    if options["days_predict"] > 0:
+        forecast_df = pipeline.run_forecast(df, options["days_predict"], options["forecast_cache"])
+        write_frame(forecast_df, report_path(out_dir, "forecast", ticker, fmt), fmt)
+
+    # まとめは最後に書く（これがある銘柄は --resume で飛ばす）
+    summary = pd.DataFrame([pipeline.summary_row(ticker, name, df, info, forecast_df)])
+    write_frame(summary, report_path(out_dir, "summary", ticker, fmt), fmt)
+    return ticker
+
+
+def write_comparison(tickers, names, options):
+    """比較モードと同じ成長率・相関のレポートを、保存済みの株価から作る"""
+    fmt = options["format"]
+    start_date, end_date = pipeline.date_range(options["years"])
+    store = PriceStore(options["db_path"])
+    closes, _ = store.get_many(tickers, start_date, end_date, options["interval"])
+    closes = closes.rename(columns=names)
+    if len(closes.columns) < 2:
+        return
+    write_frame(pipeline.growth_curves(closes), os.path.join(options["out"], f"growth.{fmt}"), fmt)
+    corr_matrix, _, mean_corr = pipeline.analyze_correlation(closes)
+    write_frame(corr_matrix, os.path.join(options["out"], f"correlation.{fmt}"), fmt)
+    write_frame(mean_corr.to_frame(), os.path.join(options["out"], f"mean_correlation.{fmt}"), fmt)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="株価・決算・AI予測の分析をまとめて実行し、レポートを書き出す")
+    parser.add_argument("tickers", nargs="*", help="銘柄コード（例: 7203.T AAPL）")
+    parser.add_argument("--all", action="store_true", help="stock_list.xlsx の全銘柄を対象にする")
+    parser.add_argument("--xlsx", default="./stock_list.xlsx", help="銘柄リストのファイル")
+    parser.add_argument("--out", default="./reports", help="出力先のフォルダ")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="出力形式")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="ワーカープロセス数")
+    parser.add_argument("--resume", action="store_true", help="まとめが出力済みの銘柄を飛ばす")
+    parser.add_argument("--interval", choices=INTERVALS, default="1d", help="足")
+    parser.add_argument("--years", type=int, default=2, help="学習期間(年)")
+    parser.add_argument("--days-predict", type=int, default=90, help="予測期間(日)。0ならAI予測をしない")
+    parser.add_argument("--skip-fundamentals", action="store_true", help="企業情報・決算を取得しない")
+    parser.add_argument("--no-compare", action="store_true", help="成長率・相関のレポートを作らない")
+    parser.add_argument("--compare-max", type=int, default=COMPARE_MAX_TICKERS,
+                        help="成長率・相関のレポートを作る銘柄数の上限（--all のときは作らない）")
+    parser.add_argument("--db-path", default="./price_cache.sqlite", help="株価ストアのファイル")
+    parser.add_argument("--fundamentals-dir", default="./fundamentals_cache", help="企業情報・決算のキャッシュ")
+    parser.add_argument("--forecast-cache", default=FORECAST_CACHE_DIR, help="AI予測のキャッシュ")
+    args = parser.parse_args(argv)
+    if not args.tickers and not args.all:
+        parser.error("銘柄コードを指定するか --all を付けてください")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = vars(args)
+
+    # 銘柄名は銘柄リストから引く（コードを指定した場合は、リストがなくても動くようにする）
+    try:
+        universe = load_universe(args.xlsx)
+    except Exception:
+        if args.all:
+            raise
+        universe = None
+    tickers = universe.codes if args.all else list(dict.fromkeys(args.tickers))
+    names = {t: universe.get_by_code(t)["query"] if universe and t in universe.by_code else t
+             for t in tickers}
+
+    todo = tickers
+    if args.resume:
+        todo = [t for t in tickers if not os.path.exists(report_path(args.out, "summary", t, args.format))]
+        print(f"{len(tickers) - len(todo)}銘柄は出力済みのため飛ばします", file=sys.stderr)
+
+    failed = []
+    started = time.monotonic()
+    # Prophet(cmdstan)はforkと相性が悪いので、spawnでプロセスを作る
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(args.db_path, args.fundamentals_dir)) as executor:
+        futures = {executor.submit(analyze_ticker, t, names[t], options): t for t in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            ticker = futures[future]
+            if future.exception() is not None:
+                failed.append(ticker)
+                print(f"[{done}/{len(todo)}] {ticker}: エラー {future.exception()}", file=sys.stderr)
+            else:
+                print(f"[{done}/{len(todo)}] {ticker}: 完了", file=sys.stderr)
+
+    # 1銘柄ずつのまとめを、全銘柄の表に結合する（--resume で前回分も含める）
+    parts = [read_frame(report_path(args.out, "summary", t, args.format), args.format)
+             for t in tickers if os.path.exists(report_path(args.out, "summary", t, args.format))]
+    if parts:
+        write_frame(pd.concat(parts, ignore_index=True), os.path.join(args.out, f"summary.{args.format}"), args.format)
+
+    compare_tickers = [t for t in tickers if t not in failed]
+    if not args.no_compare:
+        if args.all or len(compare_tickers) > args.compare_max:
+            print(f"銘柄数が多いため成長率・相関のレポートは作りません（{args.compare_max}銘柄まで。"
+                  "銘柄コードを指定して実行してください）", file=sys.stderr)
+        else:
+            write_comparison(compare_tickers, names, options)
+
+    print(f"{len(todo) - len(failed)}/{len(todo)}銘柄を分析しました（{time.monotonic() - started:.0f}秒）"
+          + (f" 失敗: {', '.join(failed)}" if failed else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# ベンチマーク: 画面を開かずに（Streamlit の AppTest で）アプリを動かし、操作ごとの所要時間を測る
+# yfinance は偽物に差し替え、ニュースのRSSと記事は手元のHTTPサーバーから配るので、ネットワークなしで毎回同じ条件になる。
+# pytest のテストではなく、手で流して前回の結果と比べるためのスクリプト。
+#
+#   python benchmarks/bench_apps.py
+#   python benchmarks/bench_apps.py --repeat 5 --tickers 500 --out bench.json
+#   python benchmarks/bench_apps.py --scenario detail --scenario news
+#
+# 各回とも空の作業フォルダから始めるので、1つ目の操作は「キャッシュなし」、
+# 同じ操作の2回目は「キャッシュあり」の時間になる。アプリ内の各段階の時間（timing.py の計測）も一緒に集計する。
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import fixtures
+import timing
+
+STOCK_APP = os.path.join(REPO_ROOT, "stock_app.py")
+NEWS_APP = os.path.join(REPO_ROOT, "news_serch.py")
+APP_TIMEOUT = 600
+
+DETAIL_MODE = "詳細分析 (単一銘柄)"
+COMPARE_MODE = "パフォーマンス比較 (複数銘柄)"
+SCREENER_MODE = "スクリーナー (全銘柄)"
+FORECAST_TAB = "🤖 AI予測(Pro)"
+
+
+def _check(at, name):
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+    if at.error:
+        raise RuntimeError(f"{name}: {at.error[0].value}")
+
+
+def _measure(name, at, action):
+    """action() を実行した時間と、その実行でアプリが記録した段階ごとの時間を返す"""
+    started = time.perf_counter()
+    action()
+    seconds = time.perf_counter() - started
+    _check(at, name)
+    spans = at.session_state[timing.LAST_RUN_KEY]["spans"] if timing.LAST_RUN_KEY in at.session_state else []
+    return {"scenario": name, "seconds": seconds, "spans": spans}
+
+
+def bench_detail():
+    at = AppTest.from_file(STOCK_APP, default_timeout=APP_TIMEOUT)
+    at.run()
+    yield _measure("detail/cold", at, lambda: at.sidebar.button[0].click().run())
+    # 同じ条件での再実行（ウィジェットを触ったときなど）
+    yield _measure("detail/rerun", at, lambda: at.run())
+
+    def open_forecast():
+        at.session_state["detail_tabs"] = FORECAST_TAB
+        at.run()
+    yield _measure("detail/forecast_cold", at, open_forecast)
+
+    # 新しいセッションでも、株価・決算・予測はディスクのキャッシュから読む
+    at = AppTest.from_file(STOCK_APP, default_timeout=APP_TIMEOUT)
+    at.run()
+    yield _measure("detail/new_session", at, lambda: at.sidebar.button[0].click().run())
+
+
+def bench_compare():
+    at = AppTest.from_file(STOCK_APP, default_timeout=APP_TIMEOUT)
+    at.run()
+    at.sidebar.radio[0].set_value(COMPARE_MODE).run()
+    at.multiselect[0].set_value(at.multiselect[0].options[:10])
+    yield _measure("compare/cold", at, lambda: at.button[0].click().run())
+    yield _measure("compare/rerun", at, lambda: at.run())
+
+
+def bench_screener():
+    at = AppTest.from_file(STOCK_APP, default_timeout=APP_TIMEOUT)
+    at.run()
+    at.sidebar.radio[0].set_value(SCREENER_MODE).run()
+    yield _measure("screener/cold", at, lambda: at.button[0].click().run())
+    yield _measure("screener/warm", at, lambda: at.button[0].click().run())
+
+
+def bench_news():
+    at = AppTest.from_file(NEWS_APP, default_timeout=APP_TIMEOUT)
+    at.run()
+    yield _measure("news/cold", at, lambda: at.sidebar.button[0].click().run())
+    yield _measure("news/warm", at, lambda: at.sidebar.button[0].click().run())
+
+
+SCENARIOS = {"detail": bench_detail, "compare": bench_compare, "screener": bench_screener, "news": bench_news}
+
+
+def run_once(scenarios, n_tickers, n_articles):
+    """空の作業フォルダを作り、キャッシュを捨ててから全シナリオを1回ずつ流す"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        os.chdir(workdir)
+        fixtures.write_stock_list(os.path.join(workdir, "stock_list.xlsx"), n_tickers)
+        with fixtures.ArticleServer(os.path.join(workdir, "site"), n_articles) as server:
+            fixtures.install(server.base_url)
+            # st.cache_resource はプロセス全体で共有されるので、前の回の株価ストアなどを捨てる
+            st.cache_resource.clear()
+            st.cache_data.clear()
+            for name in scenarios:
+                results.extend(SCENARIOS[name]())
+        os.chdir(REPO_ROOT)
+    return results
+
+
+def summarize(runs):
+    """シナリオごと・段階ごとに中央値と最小値をまとめる"""
+    by_scenario = {}
+    for run in runs:
+        for result in run:
+            entry = by_scenario.setdefault(result["scenario"], {"seconds": [], "stages": {}})
+            entry["seconds"].append(result["seconds"])
+            stages = {}
+            for span in result["spans"]:
+                stages[span["name"]] = stages.get(span["name"], 0.0) + span["seconds"]
+            for stage, seconds in stages.items():
+                entry["stages"].setdefault(stage, []).append(seconds)
+    return {
+        name: {
+            "median": statistics.median(entry["seconds"]),
+            "min": min(entry["seconds"]),
+            "runs": entry["seconds"],
+            "stages": {stage: statistics.median(values) for stage, values in entry["stages"].items()},
+        }
+        for name, entry in by_scenario.items()
+    }
+
+
+def print_report(summary):
+    print(f"{'scenario':<24}{'median':>10}{'min':>10}")
+    for name, entry in summary.items():
+        print(f"{name:<24}{entry['median']:>10.3f}{entry['min']:>10.3f}")
+        for stage, seconds in sorted(entry["stages"].items(), key=lambda kv: -kv[1]):
+            print(f"  {stage:<30}{seconds:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="アプリの操作ごとの所要時間を、偽データでオフライン計測する")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="流すシナリオ（複数指定可、省略時は全部）")
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数")
+    parser.add_argument("--tickers", type=int, default=200, help="偽の銘柄リストの銘柄数")
+    parser.add_argument("--articles", type=int, default=10, help="偽のニュース記事の数")
+    parser.add_argument("--out", help="結果を保存するJSONファイル")
+    args = parser.parse_args(argv)
+    scenarios = args.scenario or list(SCENARIOS)
+
+    runs = []
+    for i in range(args.repeat):
+        print(f"run {i + 1}/{args.repeat}...", file=sys.stderr)
+        runs.append(run_once(scenarios, args.tickers, args.articles))
+    summary = summarize(runs)
+    print_report(summary)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "summary": summary, "runs": runs}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
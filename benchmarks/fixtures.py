@@ -0,0 +1,121 @@
+import functools
+import http.server
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import feed_cache
+
+# ベンチマーク用の偽データ
+# yfinance を差し替え、ネットワークに出ずに毎回同じデータを返す。
+# ニュースのRSSと記事の本文は、手元で立てたHTTPサーバーから配る（requests → feedparser / newspaper の経路はそのまま通す）。
+
+ORIGIN = np.datetime64("2000-01-03")
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def _seed(ticker):
+    # hash() はプロセスごとに変わるので、毎回同じ値になる crc32 を使う
+    return zlib.crc32(ticker.encode("utf-8"))
+
+
+def synthetic_ohlcv(ticker, start, end, interval="1d"):
+    """銘柄ごとに決まった乱数で作る営業日のOHLCV（ランダムウォーク）"""
+    index = pd.bdate_range(pd.Timestamp(start), pd.Timestamp(end) - pd.Timedelta(days=1))
+    # 開始日が違っても同じ日の値が同じになるように、固定の起点からの営業日数で値を決める
+    positions = np.busday_count(ORIGIN, index.values.astype("datetime64[D]"))
+    n = int(positions[-1]) + 1 if len(positions) else 0
+    # 列ごとに別の乱数列を使い、期間の長さが変わっても先頭からの値が変わらないようにする
+    rngs = [np.random.default_rng([_seed(ticker), k]) for k in range(4)]
+    close = 100 * np.exp(np.cumsum(rngs[0].normal(0, 0.015, n)))
+    spread = np.abs(rngs[1].normal(0, 0.01, n)) * close
+    volume = rngs[2].integers(10_000, 1_000_000, n).astype(float)
+    noise = rngs[3].normal(0, 0.3, n)
+    df = pd.DataFrame({"Open": close + noise * spread, "High": close + spread,
+                       "Low": close - spread, "Close": close, "Volume": volume}).iloc[positions]
+    df.index = index
+    # yfinance と同じく取引所の現地時刻付きで返す
+    df = df.tz_localize("Asia/Tokyo")
+    if interval == "1wk":
+        df = df.resample("W-MON", label="left", closed="left").agg(OHLCV_AGG).dropna()
+    elif interval == "1mo":
+        df = df.resample("MS").agg(OHLCV_AGG).dropna()
+    return df
+
+
+class FakeTicker:
+    """yfinance.Ticker の代わり（history / info / financials だけ）"""
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, start=None, end=None, interval="1d", timeout=None, **kwargs):
+        return synthetic_ohlcv(self.ticker, start, end, interval)
+
+    @property
+    def info(self):
+        return {"longName": f"{self.ticker} Corp", "trailingPE": 12.3, "priceToBook": 1.1, "dividendYield": 0.025}
+
+    @property
+    def financials(self):
+        periods = pd.to_datetime(["2022-03-31", "2023-03-31", "2024-03-31", "2025-03-31"])
+        return pd.DataFrame([[100.0, 110.0, 125.0, 130.0], [8.0, 9.5, 11.0, 12.0]],
+                            index=["Total Revenue", "Net Income"], columns=periods)
+
+
+def article_html(i):
+    body = "".join(f"<p>これはベンチマーク用の記事{i}の第{j}段落です。" + "半導体の需要が伸びています。" * 5 + "</p>"
+                   for j in range(20))
+    return f"<html><head><title>記事{i}</title></head><body><article><h1>記事{i}</h1>{body}</article></body></html>"
+
+
+def rss_xml(base_url, n_entries):
+    items = "".join(f"<item><title>記事{i}</title><link>{base_url}/a{i}.html</link></item>" for i in range(n_entries))
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>ベンチマーク</title>{items}</channel></rss>'
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ArticleServer:
+    """記事のHTMLとそれを指すRSS（rss.xml）を配るローカルHTTPサーバー"""
+
+    def __init__(self, directory, n_articles=10):
+        os.makedirs(directory, exist_ok=True)
+        for i in range(n_articles):
+            with open(os.path.join(directory, f"a{i}.html"), "w", encoding="utf-8") as f:
+                f.write(article_html(i))
+        self.n_articles = n_articles
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        with open(os.path.join(directory, "rss.xml"), "w", encoding="utf-8") as f:
+            f.write(rss_xml(self.base_url, n_articles))
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def install(base_url=None):
+    """yfinance を偽物に差し替える（base_url があれば、ニュースのRSSもそのサーバーから取る）"""
+    yf.Ticker = FakeTicker
+    if base_url is not None:
+        feed_cache.RSS_URL = f"{base_url}/rss.xml?q={{query}}"
+
+
+def write_stock_list(path, n_tickers):
+    """stock_list.xlsx と同じ形（2列目=コード, 3列目=銘柄名）の銘柄リストを作る"""
+    codes = [str(1300 + i) for i in range(n_tickers)]
+    df = pd.DataFrame({"日付": "20251031", "コード": codes, "銘柄名": [f"テスト銘柄{c}" for c in codes]})
+    df.to_excel(path, index=False)
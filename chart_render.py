@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# 長期間・多銘柄のチャートをブラウザに送る前に軽くするための部品
+# ・折れ線は LTTB で形を保ったまま間引く
+# ・ローソク足は数本ずつまとめて、始値/高値/安値/終値 の意味を保ったまま集約する
+# ・点が多いときは SVG ではなく WebGL (Scattergl) で描く
+# ・最後に図全体のJSONサイズを測り、上限を超えていればさらに間引く
+#
+# 間引きはサーバー側で図を作るときに1回だけ行う。Plotlyのズームはブラウザの中だけで完結し
+# Streamlitには通知されないので、ズームしても点は増えない（拡大すると間引いた後の粗さが見える）。
+# 細かく見たい期間があるときは、呼び出し側で期間を絞ったデータを渡して作り直す
+# （比較モードの「表示期間」）。詳細モードの日足は最大5年 ≒ 1300本なので間引かれない。
+
+# チャートの横幅はおおよそ1000〜1500px。1pxあたり2点もあれば見た目は変わらない
+DEFAULT_MAX_POINTS = 2000
+GL_THRESHOLD = 1000
+DEFAULT_MAX_BYTES = 1_500_000
+
+
+def _to_numeric(x):
+    x = pd.Index(x)
+    if isinstance(x, pd.DatetimeIndex):
+        return x.asi8.astype(float)
+    return np.asarray(x, dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets で残す点のインデックスを返す（NaNの点は捨てる）"""
+    xs = _to_numeric(x)
+    ys = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(ys))
+    if len(valid) <= n_out or n_out < 3:
+        return valid
+    xs, ys = xs[valid], ys[valid]
+
+    # 最初と最後の点は必ず残し、間を n_out - 2 個のバケツに分ける
+    edges = np.linspace(1, len(ys) - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, len(ys) - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # 次のバケツの平均点を三角形の3点目に使う
+        nlo, nhi = hi, edges[b + 2] if b + 2 < len(edges) else len(ys)
+        avg_x, avg_y = xs[nlo:nhi].mean(), ys[nlo:nhi].mean()
+        area = np.abs((xs[prev] - avg_x) * (ys[lo:hi] - ys[prev])
+                      - (xs[prev] - xs[lo:hi]) * (avg_y - ys[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return valid[selected]
+
+
+def _bucket_starts(n, n_out):
+    size = int(np.ceil(n / n_out))
+    return np.arange(0, n, size)
+
+
+def bucket_ohlc(index, open_, high, low, close, n_out):
+    """数本ずつをまとめて1本のローソク足にする（始値=最初, 高値=最大, 安値=最小, 終値=最後）"""
+    index = pd.Index(index)
+    arrays = [np.asarray(a, dtype=float) for a in (open_, high, low, close)]
+    if len(index) <= n_out:
+        return (index, *arrays)
+    starts = _bucket_starts(len(index), n_out)
+    ends = np.append(starts[1:], len(index)) - 1
+    o, h, l, c = arrays
+    return (index[starts], o[starts], np.fmax.reduceat(h, starts), np.fmin.reduceat(l, starts), c[ends])
+
+
+def bucket_sum(index, values, n_out):
+    """bucket_ohlc と同じ区切りで値を合計する（出来高用）"""
+    index = pd.Index(index)
+    values = np.asarray(values, dtype=float)
+    if len(index) <= n_out:
+        return index, values
+    starts = _bucket_starts(len(index), n_out)
+    return index[starts], np.add.reduceat(np.nan_to_num(values), starts)
+
+
+def line_trace(x, y, max_points=DEFAULT_MAX_POINTS, gl_threshold=GL_THRESHOLD, **kwargs):
+    """折れ線のトレースを作る。点が多ければ LTTB で間引き、さらに多ければ WebGL で描く"""
+    x = pd.Index(x)
+    y = np.asarray(y, dtype=float)
+    if len(y) > max_points:
+        keep = lttb_indices(x, y, max_points)
+        x, y = x[keep], y[keep]
+    trace_type = go.Scattergl if len(y) > gl_threshold else go.Scatter
+    return trace_type(x=x, y=y, **kwargs)
+
+
+def candlestick_trace(df, max_points=DEFAULT_MAX_POINTS, **kwargs):
+    index, o, h, l, c = bucket_ohlc(df.index, df['Open'], df['High'], df['Low'], df['Close'], max_points)
+    return go.Candlestick(x=index, open=o, high=h, low=l, close=c, **kwargs)
+
+
+def volume_trace(df, max_points=DEFAULT_MAX_POINTS, **kwargs):
+    index, volume = bucket_sum(df.index, df['Volume'], max_points)
+    return go.Bar(x=index, y=volume, **kwargs)
+
+
+def payload_bytes(fig):
+    """ブラウザに送られる図のJSONのサイズ（バイト）"""
+    return len(fig.to_json().encode("utf-8"))
+
+
+def _decimate_trace(trace, n_out):
+    if trace.x is None or len(trace.x) <= n_out:
+        return
+    if trace.type == "candlestick":
+        trace.x, trace.open, trace.high, trace.low, trace.close = bucket_ohlc(
+            trace.x, trace.open, trace.high, trace.low, trace.close, n_out)
+    elif trace.type == "bar":
+        trace.x, trace.y = bucket_sum(trace.x, trace.y, n_out)
+    elif trace.type in ("scatter", "scattergl") and trace.y is not None:
+        keep = lttb_indices(trace.x, trace.y, n_out)
+        trace.x, trace.y = np.asarray(trace.x)[keep], np.asarray(trace.y)[keep]
+
+
+def cap_payload(fig, max_bytes=DEFAULT_MAX_BYTES, min_points=100):
+    """図のJSONが max_bytes を超えていれば、超えた割合に合わせて各トレースの点数を減らして収める
+
+    戻り値は最終的なサイズ（バイト）
+    """
+    size = payload_bytes(fig)
+    n_out = max((len(t.x) for t in fig.data if t.x is not None), default=0)
+    while size > max_bytes and n_out > min_points:
+        # サイズはほぼ点数に比例するので、はみ出した割合だけ（少し余裕を持って）減らす
+        n_out = max(min_points, min(n_out - 1, int(n_out * max_bytes / size * 0.9)))
+        for trace in fig.data:
+            _decimate_trace(trace, n_out)
+        size = payload_bytes(fig)
+    return size
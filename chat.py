@@ -1,37 +1,85 @@
 import streamlit as st
-import time
+import uuid
+from chat_backend import EchoBackend
+from chat_history import ChatHistory, SQLiteChatStore
 
 st.title("AIチャット簡易版 🤖")
 
+@st.cache_resource
+def get_backend():
+    # 返答を作る部分（今はオウム返し）。stream() を持つものなら本物のモデルに差し替えられる
+    return EchoBackend()
+
+@st.cache_resource
+def get_chat_store():
+    # 「会話を保存する」をオンにしたときの保存先
+    return SQLiteChatStore()
+
 # 1. 「会話の履歴」を保存する場所を作る
 # Streamlitはボタンを押すたびにリセットされるので、
 # "session_state" という場所に履歴を避難させておく必要があります。
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# 画面に出すのは最近の発言だけにして、古い発言は下の「以前の会話」からページごとに見られるようにします。
+# こうしておくと、会話がどれだけ長くなっても動作が重くなりません。
+st.sidebar.header("⚙️ 設定")
+persist = st.sidebar.checkbox("会話をこのPCに保存する", value=False)
+
+# 会話はブラウザのセッションごとに分けて保存する（ほかのタブの会話と混ざらないように）
+# 番号をURLに入れておくので、同じURLを開き直せば保存した会話の続きから始められる
+if "chat_id" not in st.session_state:
+    st.session_state.chat_id = st.query_params.get("chat") or uuid.uuid4().hex[:12]
+if persist:
+    st.query_params["chat"] = st.session_state.chat_id
+
+if st.session_state.get("chat_persist") != persist or "chat_history" not in st.session_state:
+    # 保存のオン・オフを切り替えたら、履歴の入れ物を作り直す（画面に出ている会話は引き継ぐ）
+    previous = st.session_state.get("chat_history")
+    history = ChatHistory(store=get_chat_store() if persist else None, conversation=st.session_state.chat_id)
+    if previous is not None:
+        if persist:
+            # オンにしたときは、まだ保存していない発言だけを保存済みの会話に書き足す
+            for msg in previous.unsaved_messages():
+                history.append(msg["role"], msg["content"])
+        else:
+            # オフにしたときは画面の会話をメモリに移す（これらは保存済みなので、未保存には数えない）
+            for msg in previous.messages():
+                history.append(msg["role"], msg["content"])
+            history.unsaved = 0
+    st.session_state.chat_history = history
+    st.session_state.chat_persist = persist
+
+history = st.session_state.chat_history
+
+if st.sidebar.button("会話をクリア 🗑"):
+    history.clear()
 
 # 2. 過去のやり取りを画面に表示しなおす
 # これがないと、新しい発言をするたびに過去の会話が消えてしまいます。
-for msg in st.session_state.messages:
+if history.n_older:
+    with st.expander(f"以前の会話 ({history.n_older}件)"):
+        page_size = 20
+        n_pages = (history.n_older - 1) // page_size + 1
+        page = st.number_input(f"ページ (1が新しい方 / 全{n_pages}ページ)", min_value=1, max_value=n_pages, value=1)
+        for msg in history.older_page(page - 1, page_size):
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+
+for msg in history.recent:
     with st.chat_message(msg["role"]):
         st.write(msg["content"])
 
 # 3. 入力欄を表示し、入力されたら処理スタート
 if prompt := st.chat_input("何か話しかけてみて！"):
-    
+
     # A. ユーザーの入力（prompt）を表示・保存
     with st.chat_message("user"):
         st.write(prompt)
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
 
     # --- ここからAIのターン ---
-    
-    # B. AIの返答を作る（今はオウム返し）
-    response = f"なるほど、「{prompt}」なんですね！"
-    
-    # C. AIの返答を表示・保存
+
+    # B. AIの返答を、できた部分から少しずつ表示する（待たずにすぐ書き始める）
     with st.chat_message("assistant"):
-        # ちょっと考えているフリをする演出（0.5秒待つ）
-        time.sleep(0.5)
-        st.write(response)
-    
-    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+        response = st.write_stream(get_backend().stream(history.context()))
+
+    # C. 全部そろった返答を保存
+    history.append("assistant", response)
@@ -0,0 +1,34 @@
+import re
+import time
+
+# チャットの返答を作る部分
+# バックエンドは stream(messages) で返答を少しずつ（トークンごとに）返すものなら何でも差し替えられる。
+# messages は {"role": "user" / "assistant", "content": 本文} の辞書のリスト（古い順）。
+
+# 英数字のまとまりは1トークン、それ以外（日本語など）は1文字ずつを1トークンとして扱う
+_TOKEN_PATTERN = re.compile(r"[0-9A-Za-z]+\s*|\s+|.", re.DOTALL)
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(text)
+
+
+class EchoBackend:
+    """ユーザーの発言をオウム返しする、手元で動く仮のバックエンド
+
+    delay を指定すると、1トークンごとにその秒数だけ待つ（本物のモデルのような見た目を確認する用）。
+    既定では待たないので、返答はすぐに出る。
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def reply(self, messages):
+        prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return f"なるほど、「{prompt}」なんですね！"
+
+    def stream(self, messages):
+        for token in tokenize(self.reply(messages)):
+            if self.delay:
+                time.sleep(self.delay)
+            yield token
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# チャットの会話履歴
+# 画面に出すのは直近 window 件だけにして、それより古い発言はページごとに読み出す。
+# 会話がどれだけ長くなっても、1回の再実行で描画する量とメモリの使用量は一定に保たれる。
+
+DEFAULT_DB_PATH = "./chat_history.sqlite"
+DEFAULT_WINDOW = 20
+DEFAULT_MAX_MESSAGES = 1000
+
+
+class SQLiteChatStore:
+    """会話をローカルのSQLiteに保存するストア（アプリを起動し直しても履歴が残る）"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation TEXT, role TEXT, content TEXT, created_at REAL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def add(self, conversation, role, content):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT INTO messages (conversation, role, content, created_at) VALUES (?, ?, ?, ?)",
+                         (conversation, role, content, time.time()))
+
+    def count(self, conversation):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM messages WHERE conversation = ?", (conversation,)).fetchone()[0]
+
+    def tail(self, conversation, limit, offset=0):
+        """新しい方から offset 件を飛ばした limit 件を、古い順に返す"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE conversation = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (conversation, limit, offset)).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def clear(self, conversation):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE conversation = ?", (conversation,))
+
+
+class ChatHistory:
+    """直近 window 件をメモリに持ち、それより古い発言はページ単位で返す会話履歴
+
+    store を渡すと全件をストアに保存し、古い発言はストアから読む（メモリには直近分だけ）。
+    store がなければ古い発言もメモリに残すが、全体で max_messages 件を超えた分は古い順に捨てる。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_messages=DEFAULT_MAX_MESSAGES, store=None, conversation="default"):
+        self.store = store
+        self.conversation = conversation
+        self.recent = deque(maxlen=window)
+        self._older = deque(maxlen=max(0, max_messages - window))
+        self._n_older = 0
+        # ストアなしで追加した（まだどこにも保存されていない）発言の数
+        self.unsaved = 0
+        if store is not None:
+            self.recent.extend(store.tail(conversation, window))
+            self._n_older = store.count(conversation) - len(self.recent)
+
+    def __len__(self):
+        return self.n_older + len(self.recent)
+
+    @property
+    def n_older(self):
+        """画面の外（直近 window 件より前）にある発言の数"""
+        return self._n_older if self.store is not None else len(self._older)
+
+    def append(self, role, content):
+        message = {"role": role, "content": content}
+        if self.store is not None:
+            self.store.add(self.conversation, role, content)
+        else:
+            self.unsaved += 1
+        if len(self.recent) == self.recent.maxlen:
+            if self.store is not None:
+                self._n_older += 1
+            else:
+                self._older.append(self.recent[0])
+        self.recent.append(message)
+
+    def older_page(self, page, page_size=DEFAULT_WINDOW):
+        """古い発言のページを古い順に返す。page=0 が画面に出ている分のすぐ前"""
+        if self.store is not None:
+            return self.store.tail(self.conversation, page_size, offset=len(self.recent) + page * page_size)
+        end = max(0, len(self._older) - page * page_size)
+        return list(islice(self._older, max(0, end - page_size), end))
+
+    def messages(self):
+        """メモリにある発言を全部（古い順に）返す。ストアがあるときは直近分だけ"""
+        return list(self._older) + list(self.recent)
+
+    def unsaved_messages(self):
+        """ストアなしで追加した発言（古い順）。保存をオンにしたときに書き足す分"""
+        messages = self.messages()
+        return messages[max(0, len(messages) - self.unsaved):]
+
+    def context(self, n=None):
+        """バックエンドに渡す直近の発言（古い順）"""
+        messages = list(self.recent)
+        return messages if n is None else messages[-n:]
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear(self.conversation)
+        self.recent.clear()
+        self._older.clear()
+        self._n_older = 0
+        self.unsaved = 0
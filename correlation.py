@@ -0,0 +1,144 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# 比較モードの相関ヒートマップ用の計算モジュール
+# 株価そのものではなく足ごと（日足なら日次、週足なら週次）の騰落率（リターン）同士の相関を見る
+# 欠損（休場日の違いなど）はペアごとに「両方そろっている足」だけで計算する（pandas の corr() と同じ）
+
+
+def to_returns(prices):
+    """終値の表（日付 × 銘柄）を騰落率の表に変換する"""
+    return prices.pct_change(fill_method=None).iloc[1:]
+
+
+def _pairwise_sums(xa, ma, xb, mb):
+    """2つの列ブロックについて、両方そろっている足だけの件数・合計・二乗和・積和を行列積で求める"""
+    n = ma.T @ mb
+    sa = xa.T @ mb
+    sb = ma.T @ xb
+    saa = (xa ** 2).T @ mb
+    sbb = ma.T @ (xb ** 2)
+    sab = xa.T @ xb
+    return n, sa, sb, saa, sbb, sab
+
+
+def _corr_from_sums(n, sa, sb, saa, sbb, sab, min_periods):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sab - sa * sb / n
+        var_a = saa - sa ** 2 / n
+        var_b = sbb - sb ** 2 / n
+        corr = cov / np.sqrt(var_a * var_b)
+    corr[n < max(min_periods, 2)] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+def correlation_matrix(returns, block_size=256, min_periods=2):
+    """相関行列をブロックごとの行列積で計算する（数百銘柄でもメモリを食いすぎない）"""
+    values = np.asarray(returns, dtype=float)
+    mask = np.isfinite(values).astype(float)
+    x = np.where(mask > 0, values, 0.0)
+    n_cols = values.shape[1]
+    corr = np.empty((n_cols, n_cols))
+    for i in range(0, n_cols, block_size):
+        a = slice(i, i + block_size)
+        for j in range(i, n_cols, block_size):
+            b = slice(j, j + block_size)
+            block = _corr_from_sums(*_pairwise_sums(x[:, a], mask[:, a], x[:, b], mask[:, b]), min_periods)
+            corr[a, b] = block
+            corr[b, a] = block.T
+    np.fill_diagonal(corr, 1.0)
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(corr, index=returns.columns, columns=returns.columns)
+    return corr
+
+
+class RollingCorrelation:
+    """直近 window 本のリターンの相関行列を、1本ずつずらしながら更新する
+
+    件数・合計・二乗和・積和を足し引きするだけなので、1本あたりの計算量は銘柄数の2乗で済む
+    （窓の長さには依存しない）。
+    """
+
+    def __init__(self, n_tickers, window=60, min_periods=None):
+        self.window = window
+        self.min_periods = min_periods or window // 2
+        self.rows = deque()
+        shape = (n_tickers, n_tickers)
+        self.n, self.sa, self.sb, self.saa, self.sbb, self.sab = (np.zeros(shape) for _ in range(6))
+
+    def _apply(self, row, sign):
+        mask = np.isfinite(row).astype(float)[None, :]
+        x = np.where(mask > 0, row[None, :], 0.0)
+        for total, part in zip((self.n, self.sa, self.sb, self.saa, self.sbb, self.sab),
+                               _pairwise_sums(x, mask, x, mask)):
+            total += sign * part
+
+    def update(self, row):
+        """リターン1日分（銘柄数の配列）を追加し、最新の相関行列を返す"""
+        row = np.asarray(row, dtype=float)
+        self.rows.append(row)
+        self._apply(row, +1)
+        if len(self.rows) > self.window:
+            self._apply(self.rows.popleft(), -1)
+        corr = _corr_from_sums(self.n, self.sa, self.sb, self.saa, self.sbb, self.sab, self.min_periods)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+
+def rolling_mean_correlation(returns, window=60):
+    """全ペアの平均相関の推移（市場全体がどれだけ同じ方向に動いているかの目安）"""
+    values = np.asarray(returns, dtype=float)
+    n_cols = values.shape[1]
+    rolling = RollingCorrelation(n_cols, window)
+    off_diag = ~np.eye(n_cols, dtype=bool)
+    result = []
+    for row in values:
+        corr = rolling.update(row)
+        result.append(np.nanmean(corr[off_diag]) if len(rolling.rows) >= window and np.isfinite(corr[off_diag]).any() else np.nan)
+    return pd.Series(result, index=getattr(returns, "index", None), name="平均相関")
+
+
+def cluster_order(corr):
+    """平均連結法の階層クラスタリングで、似た動きの銘柄が隣り合う並び順を返す"""
+    c = np.asarray(corr, dtype=float)
+    n = len(c)
+    if n <= 2:
+        return list(range(n))
+    dist = 1 - np.nan_to_num(c, nan=0.0)
+    np.fill_diagonal(dist, np.inf)
+    members = {i: [i] for i in range(n)}
+    active = np.ones(n, dtype=bool)
+    while len(members) > 1:
+        masked = np.where(active[:, None] & active[None, :], dist, np.inf)
+        i, j = np.unravel_index(np.argmin(masked), masked.shape)
+        i, j = min(i, j), max(i, j)
+        # ランス・ウィリアムズの更新式（平均連結）でクラスタ間の距離を更新する
+        ni, nj = len(members[i]), len(members[j])
+        merged = (ni * dist[i] + nj * dist[j]) / (ni + nj)
+        dist[i], dist[:, i] = merged, merged
+        dist[i, i] = np.inf
+        active[j] = False
+        members[i] = members[i] + members.pop(j)
+    return next(iter(members.values()))
+
+
+def top_pairs(corr, k=10, largest=True):
+    """相関が最も高い（largest=False なら最も低い）ペアを k 組、表にして返す"""
+    labels = list(corr.columns) if isinstance(corr, pd.DataFrame) else list(range(len(corr)))
+    c = np.asarray(corr, dtype=float)
+    rows, cols = np.triu_indices(len(c), k=1)
+    values = c[rows, cols]
+    finite = np.flatnonzero(np.isfinite(values))
+    if len(finite) == 0:
+        return pd.DataFrame(columns=["銘柄A", "銘柄B", "相関"])
+    scores = values[finite] if largest else -values[finite]
+    k = min(k, len(finite))
+    best = finite[np.argpartition(-scores, k - 1)[:k]]
+    best = best[np.argsort(-values[best] if largest else values[best])]
+    return pd.DataFrame({
+        "銘柄A": [labels[rows[i]] for i in best],
+        "銘柄B": [labels[cols[i]] for i in best],
+        "相関": values[best],
+    })
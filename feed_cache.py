@@ -0,0 +1,118 @@
+import re
+import threading
+import time
+import unicodedata
+import urllib.parse
+from collections import OrderedDict
+
+import feedparser
+import requests
+
+# Google News の RSS を取ってくる共通モジュール（stock_app.py と news_serch.py で共有）
+# 検索語ごとに一定時間キャッシュし、期限が切れたら ETag / Last-Modified 付きで
+# 「変わっていれば送って」と問い合わせる（変わっていなければ 304 が返り、本文は送られてこない）
+# 取得は requests でタイムアウトを付けて行い、届いた本文だけを feedparser に渡す
+
+RSS_URL = "https://news.google.com/rss/search?q={query}&hl=ja&gl=JP&ceid=JP:ja"
+
+
+def normalize_query(query):
+    """全角・半角や余分な空白の違いで別のキャッシュにならないよう、検索語を揃える"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", str(query))).strip()
+
+
+def build_url(query):
+    return RSS_URL.format(query=urllib.parse.quote(normalize_query(query)))
+
+
+class FeedCache:
+    """検索語 → 記事リスト の LRU + TTL キャッシュ
+
+    同じリンクの記事は、どの検索語から取れても同じオブジェクトを使い回す。
+    """
+
+    def __init__(self, ttl=600, max_items=128, timeout=10):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._links = {}
+        self._lock = threading.Lock()
+
+    def _register(self, entries):
+        # 1つのフィード内の重複を除きつつ、他の検索語で取得済みの記事はそれと差し替える
+        result = {}
+        for entry in entries:
+            link = entry.get("link")
+            if not link or link in result:
+                continue
+            if link in self._links:
+                self._links[link][1] += 1
+            else:
+                self._links[link] = [entry, 1]
+            result[link] = self._links[link][0]
+        return list(result.values())
+
+    def _release(self, entries):
+        for entry in entries:
+            item = self._links.get(entry.get("link"))
+            if item is not None:
+                item[1] -= 1
+                if item[1] <= 0:
+                    del self._links[entry.get("link")]
+
+    def _fetch(self, url, etag=None, modified=None):
+        """フィードを取得して feedparser の結果を返す。変わっていなければ None、取得に失敗したら例外"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        response = requests.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        feed = feedparser.parse(response.content)
+        feed["etag"] = response.headers.get("ETag")
+        feed["modified"] = response.headers.get("Last-Modified")
+        return feed
+
+    def get(self, query):
+        """検索語に対応する記事リストを返す（新しすぎるキャッシュがあれば通信しない）"""
+        key = normalize_query(query)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                if time.monotonic() - item["fetched"] < self.ttl:
+                    return item["entries"]
+
+        try:
+            feed = self._fetch(build_url(key), item["etag"] if item else None, item["modified"] if item else None)
+        except requests.RequestException:
+            feed = {"entries": []}
+
+        with self._lock:
+            if feed is None or not feed["entries"]:
+                # 変わっていない（または取得に失敗した・空だった）
+                if item is None:
+                    # 手元に何もなければキャッシュせず、次回また取りに行く
+                    return []
+                # 手元の記事をそのまま使う
+                item["fetched"] = time.monotonic()
+                return item["entries"]
+
+            old = self._items.pop(key, None)
+            entries = self._register(feed.entries)
+            if old is not None:
+                self._release(old["entries"])
+            self._items[key] = {
+                "fetched": time.monotonic(),
+                "etag": feed.get("etag"),
+                "modified": feed.get("modified"),
+                "entries": entries,
+            }
+            while len(self._items) > self.max_items:
+                _, evicted = self._items.popitem(last=False)
+                self._release(evicted["entries"])
+            return entries
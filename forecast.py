@@ -0,0 +1,160 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+
+# Prophetの学習結果と予測結果をディスクにキャッシュし、
+# 学習は別プロセスで走らせてページ全体を止めないようにする
+# キャッシュが max_bytes を超えたら、最後に使われたのが古いファイルから消していく
+
+DEFAULT_CACHE_DIR = "./forecast_cache"
+DEFAULT_MAX_CACHE_BYTES = 1024 ** 3
+PROPHET_PARAMS = {}
+
+
+def make_prophet_frame(df):
+    """株価のDataFrameをProphet用の ds / y 形式に変換する"""
+    data = df.reset_index()
+    date_col = 'Date' if 'Date' in data.columns else 'Datetime'
+    if date_col in data.columns:
+        if pd.api.types.is_datetime64_any_dtype(data[date_col]):
+            data[date_col] = data[date_col].dt.tz_localize(None)
+    return data[[date_col, 'Close']].rename(columns={date_col: 'ds', 'Close': 'y'})
+
+
+def model_key(df_p, params=PROPHET_PARAMS):
+    """学習データとパラメータから作るキー（予測期間は含めない）"""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df_p[['ds', 'y']], index=False).values.tobytes())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+
+def _paths(cache_dir, key, periods):
+    return (os.path.join(cache_dir, f"model_{key}.json"),
+            os.path.join(cache_dir, f"forecast_{key}_{periods}.pkl"))
+
+
+def _write_atomic(path, write):
+    """途中で止まったり別のプロセスが読んだりしても壊れたファイルが見えないように、一時ファイルに書いてから置き換える"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def evict(cache_dir, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """キャッシュの合計が max_bytes 以下になるまで、更新時刻（最後に使った時刻）が古いファイルから消す"""
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.startswith(("model_", "forecast_")) and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # 別のプロセスが先に消した
+            pass
+        total -= size
+
+
+def _fit_and_predict(df_p, periods, params, cache_dir, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """ワーカープロセスで動く本体。予測期間だけ変わった場合は学習済みモデルを使い回す"""
+    os.makedirs(cache_dir, exist_ok=True)
+    key = model_key(df_p, params)
+    model_path, forecast_path = _paths(cache_dir, key, periods)
+
+    try:
+        with open(model_path) as f:
+            model_json = f.read()
+        m = model_from_json(model_json)
+    except FileNotFoundError:
+        m = Prophet(**params)
+        m.fit(df_p)
+        model_json = model_to_json(m)
+        _write_atomic(model_path, lambda path: _write_text(path, model_json))
+
+    forecast = m.predict(m.make_future_dataframe(periods=periods))
+    _write_atomic(forecast_path, forecast.to_pickle)
+    evict(cache_dir, max_bytes)
+    return model_json, forecast
+
+
+def _load_cached(cache_dir, key, periods):
+    """同じ条件の予測が残っていれば (学習済みモデル, 予測DataFrame) を、なければ None を返す"""
+    model_path, forecast_path = _paths(cache_dir, key, periods)
+    try:
+        with open(model_path) as f:
+            model_json = f.read()
+        forecast = pd.read_pickle(forecast_path)
+        # 使ったファイルは更新時刻を新しくして、キャッシュの整理で消されにくくする
+        os.utime(model_path)
+        os.utime(forecast_path)
+    except FileNotFoundError:
+        return None
+    return model_from_json(model_json), forecast
+
+
+def predict(df_p, periods, params=PROPHET_PARAMS, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """その場で（呼び出したプロセスの中で）予測する。バッチ処理のワーカーから使う
+
+    キャッシュは ForecastService と共通なので、夜間に計算しておけば画面側はすぐに表示できる。
+    """
+    cached = _load_cached(cache_dir, model_key(df_p, params), periods)
+    if cached is not None:
+        return cached
+    model_json, forecast = _fit_and_predict(df_p, periods, params, cache_dir, max_bytes)
+    return model_from_json(model_json), forecast
+
+
+class ForecastService:
+    """Prophet予測をキャッシュ付き・別プロセスで実行するサービス
+
+    submit() はすぐに Future を返すので、その間に他のセクションを描画できる。
+    Future の結果は (学習済みモデル, 予測DataFrame)。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_workers=2, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Streamlitはマルチスレッドで動いているので、forkではなくspawnでプロセスを作る
+        self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, df_p, periods, params=PROPHET_PARAMS):
+        # 同じ条件の予測が残っていれば、プロセスを使わずにその場で返す
+        cached = _load_cached(self.cache_dir, model_key(df_p, params), periods)
+        if cached is not None:
+            result = Future()
+            result.set_result(cached)
+            return result
+
+        inner = self._executor.submit(_fit_and_predict, df_p, periods, params, self.cache_dir, self.max_bytes)
+        result = Future()
+
+        def _done(f):
+            if f.exception() is not None:
+                result.set_exception(f.exception())
+            else:
+                model_json, forecast = f.result()
+                result.set_result((model_from_json(model_json), forecast))
+
+        inner.add_done_callback(_done)
+        return result
@@ -0,0 +1,75 @@
+import os
+import pickle
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import yfinance as yf
+
+# 企業情報（info）と決算（financials）は四半期ごとにしか変わらないので、
+# 株価とは別にディスクへ一定期間キャッシュしておく
+
+DEFAULT_CACHE_DIR = "./fundamentals_cache"
+INFO_TTL = 24 * 60 * 60
+FINANCIALS_TTL = 7 * 24 * 60 * 60
+
+
+class FundamentalsCache:
+    """銘柄ごとの info / financials を TTL 付きでディスクに保存するキャッシュ"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, info_ttl=INFO_TTL, financials_ttl=FINANCIALS_TTL):
+        self.cache_dir = cache_dir
+        self.ttls = {"info": info_ttl, "financials": financials_ttl}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, ticker, kind):
+        safe = re.sub(r"[^0-9A-Za-z._-]", "_", ticker)
+        return os.path.join(self.cache_dir, f"{safe}.{kind}.pkl")
+
+    def _get(self, ticker, kind, load):
+        path = self._path(ticker, kind)
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < self.ttls[kind]:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+        value = load()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f)
+        with self._lock:
+            os.replace(tmp_path, path)
+        return value
+
+    def get_info(self, ticker):
+        return self._get(ticker, "info", lambda: yf.Ticker(ticker).info)
+
+    def get_financials(self, ticker):
+        return self._get(ticker, "financials", lambda: yf.Ticker(ticker).financials)
+
+
+def iter_completed(futures, timeouts):
+    """{名前: Future} を終わった順に (名前, 結果, 例外) で返す
+
+    名前ごとに timeouts[名前] 秒（投げた時点から）を過ぎても終わらないものは
+    TimeoutError として返すので、遅い1つが他のセクションの表示を止めない。
+    """
+    started = time.monotonic()
+    pending = dict(futures)
+    while pending:
+        now = time.monotonic()
+        for name in [n for n in pending if now - started >= timeouts[n]]:
+            pending.pop(name).cancel()
+            yield name, None, TimeoutError(f"{timeouts[name]}秒以内に応答がありませんでした")
+        if not pending:
+            break
+        next_deadline = min(started + timeouts[n] for n in pending)
+        done, _ = wait(list(pending.values()), timeout=max(0, next_deadline - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for name in [n for n, f in pending.items() if f in done]:
+            future = pending.pop(name)
+            if future.exception() is not None:
+                yield name, None, future.exception()
+            else:
+                yield name, future.result(), None
@@ -0,0 +1,232 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# テクニカル指標を「日付 × 銘柄」の2次元配列でまとめて計算するモジュール
+# 1次元（1銘柄）の配列を渡した場合は1次元で返す
+# NaN の扱いは pandas の rolling(window).mean() と同じ（窓の中にNaNがあればNaN）
+
+
+def _as_2d(values):
+    arr = np.asarray(values, dtype=float)
+    if arr.ndim == 1:
+        return arr[:, None], True
+    return arr, False
+
+
+def _restore(arr, was_1d):
+    return arr[:, 0] if was_1d else arr
+
+
+def _rolling_mean_2d(x, window):
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        # 窓ごとにそのまま平均を取るので、累積和の引き算のような誤差がたまらない
+        out[window - 1:] = sliding_window_view(x, window, axis=0).mean(axis=-1)
+    return out
+
+
+def _diff_gain_loss(x):
+    delta = np.full(x.shape, np.nan)
+    delta[1:] = x[1:] - x[:-1]
+    # pandas の delta.where(delta > 0, 0) と同じく、NaN は 0 として扱う
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    return gain, loss
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def sma(values, window):
+    """単純移動平均"""
+    x, was_1d = _as_2d(values)
+    return _restore(_rolling_mean_2d(x, window), was_1d)
+
+
+def rsi(values, window=14):
+    """RSI（上昇幅・下落幅の単純移動平均版。stock_app.calculate_rsi と同じ定義）"""
+    x, was_1d = _as_2d(values)
+    gain, loss = _diff_gain_loss(x)
+    out = _rsi_from_averages(_rolling_mean_2d(gain, window), _rolling_mean_2d(loss, window))
+    return _restore(out, was_1d)
+
+
+def rsi_wilder(values, window=14):
+    """RSI（ワイルダーの平滑化版）
+
+    最初の window 本の変化幅の単純平均を起点に、
+    avg = (前回のavg × (window - 1) + 今回の値) / window で更新していく
+    """
+    x, was_1d = _as_2d(values)
+    gain, loss = _diff_gain_loss(x)
+    out = np.full(x.shape, np.nan)
+    if len(x) > window:
+        avg_gain = gain[1:window + 1].mean(axis=0)
+        avg_loss = loss[1:window + 1].mean(axis=0)
+        out[window] = _rsi_from_averages(avg_gain, avg_loss)
+        for t in range(window + 1, len(x)):
+            avg_gain = (avg_gain * (window - 1) + gain[t]) / window
+            avg_loss = (avg_loss * (window - 1) + loss[t]) / window
+            out[t] = _rsi_from_averages(avg_gain, avg_loss)
+    return _restore(out, was_1d)
+
+
+def ema(values, span):
+    """指数移動平均（pandas の ewm(span=span, adjust=False).mean() 相当）
+
+    各銘柄の最初の有効値から計算を始め、NaN の日は直前の値を引き継ぐ
+    """
+    x, was_1d = _as_2d(values)
+    alpha = 2.0 / (span + 1)
+    out = np.full(x.shape, np.nan)
+    prev = np.full(x.shape[1], np.nan)
+    for t in range(len(x)):
+        row = x[t]
+        prev = np.where(np.isnan(prev), row, np.where(np.isnan(row), prev, alpha * row + (1 - alpha) * prev))
+        out[t] = prev
+    return _restore(out, was_1d)
+
+
+def bollinger(values, window=20, k=2.0):
+    """ボリンジャーバンド。戻り値は (中心線, 上限, 下限)。標準偏差は母標準偏差"""
+    x, was_1d = _as_2d(values)
+    mid = _rolling_mean_2d(x, window)
+    std = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        std[window - 1:] = sliding_window_view(x, window, axis=0).std(axis=-1)
+    upper, lower = mid + k * std, mid - k * std
+    return tuple(_restore(a, was_1d) for a in (mid, upper, lower))
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """MACD。戻り値は (MACD線, シグナル線, ヒストグラム)"""
+    x, was_1d = _as_2d(values)
+    line = ema(x, fast) - ema(x, slow)
+    sig = ema(line, signal)
+    return tuple(_restore(a, was_1d) for a in (line, sig, line - sig))
+
+
+class _RollingWindow:
+    """固定長のリングバッファ。合計・二乗和をずらしながら更新して、1本あたりO(1)で平均を出す"""
+
+    def __init__(self, window, n):
+        self.window = window
+        self.buf = np.full((window, n), np.nan)
+        self.total = np.zeros(n)
+        self.total_sq = np.zeros(n)
+        self.nan_count = np.full(n, window)
+        self.pos = 0
+        self.pushes = 0
+
+    def push(self, row):
+        old = self.buf[self.pos]
+        old_nan, new_nan = np.isnan(old), np.isnan(row)
+        self.total += np.where(new_nan, 0.0, row) - np.where(old_nan, 0.0, old)
+        self.total_sq += np.where(new_nan, 0.0, row ** 2) - np.where(old_nan, 0.0, old ** 2)
+        self.nan_count += new_nan.astype(int) - old_nan.astype(int)
+        self.buf[self.pos] = row
+        self.pos = (self.pos + 1) % self.window
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            # 足し引きの丸め誤差がたまらないよう、一周ごとに合計を取り直す
+            self.total = np.nansum(self.buf, axis=0)
+            self.total_sq = np.nansum(self.buf ** 2, axis=0)
+
+    def mean(self):
+        return np.where(self.nan_count > 0, np.nan, self.total / self.window)
+
+    def std(self):
+        mean = self.mean()
+        var = np.maximum(self.total_sq / self.window - mean ** 2, 0.0)
+        return np.sqrt(var)
+
+
+class IndicatorState:
+    """新しい足が1本増えるたびに、全銘柄の最新の指標値をO(1)で更新するための状態
+
+    使い方:
+        state = IndicatorState.from_history(closes)   # 過去データ (日付 × 銘柄)
+        latest = state.update(new_close_row)          # 新しい1日分 (銘柄数の配列)
+    """
+
+    def __init__(self, n_tickers, rsi_window=14, sma_windows=(25, 75),
+                 ema_spans=(12, 26), macd_signal=9, bb_window=20, bb_k=2.0):
+        self.rsi_window = rsi_window
+        self.ema_spans = tuple(ema_spans)
+        self.macd_signal = macd_signal
+        self.bb_k = bb_k
+        self.sma_windows = {w: _RollingWindow(w, n_tickers) for w in sma_windows}
+        self.bb = _RollingWindow(bb_window, n_tickers)
+        self.gain = _RollingWindow(rsi_window, n_tickers)
+        self.loss = _RollingWindow(rsi_window, n_tickers)
+        self.wilder_gain = np.zeros(n_tickers)
+        self.wilder_loss = np.zeros(n_tickers)
+        self.ema = {span: np.full(n_tickers, np.nan) for span in self.ema_spans}
+        self.signal = np.full(n_tickers, np.nan)
+        self.last_close = np.full(n_tickers, np.nan)
+        self.bars = 0
+
+    @classmethod
+    def from_history(cls, closes, **kwargs):
+        x, _ = _as_2d(closes)
+        state = cls(x.shape[1], **kwargs)
+        for row in x:
+            state.update(row)
+        return state
+
+    @staticmethod
+    def _ema_step(prev, row, span):
+        alpha = 2.0 / (span + 1)
+        return np.where(np.isnan(prev), row, np.where(np.isnan(row), prev, alpha * row + (1 - alpha) * prev))
+
+    def update(self, close_row):
+        """1本分の終値を追加し、各指標の最新値を辞書で返す"""
+        row = np.asarray(close_row, dtype=float)
+        # 最初の足やNaNの日は変化幅がNaNになり、rsi() と同じく 0 として扱われる
+        delta = row - self.last_close
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        self.last_close = row
+        self.bars += 1
+
+        for window in self.sma_windows.values():
+            window.push(row)
+        self.bb.push(row)
+        self.gain.push(gain)
+        self.loss.push(loss)
+
+        w = self.rsi_window
+        if 1 < self.bars <= w + 1:
+            self.wilder_gain += gain / w
+            self.wilder_loss += loss / w
+        elif self.bars > w + 1:
+            self.wilder_gain = (self.wilder_gain * (w - 1) + gain) / w
+            self.wilder_loss = (self.wilder_loss * (w - 1) + loss) / w
+
+        for span in self.ema_spans:
+            self.ema[span] = self._ema_step(self.ema[span], row, span)
+        fast, slow = self.ema_spans
+        macd_line = self.ema[fast] - self.ema[slow]
+        self.signal = self._ema_step(self.signal, macd_line, self.macd_signal)
+
+        bb_mid = self.bb.mean()
+        bb_std = self.bb.std()
+        nan = np.full_like(row, np.nan)
+        result = {
+            "RSI": _rsi_from_averages(self.gain.mean(), self.loss.mean()) if self.bars >= w else nan,
+            "RSI_Wilder": _rsi_from_averages(self.wilder_gain, self.wilder_loss) if self.bars > w else nan,
+            "MACD": macd_line,
+            "MACD_Signal": self.signal,
+            "MACD_Hist": macd_line - self.signal,
+            "BB_Mid": bb_mid,
+            "BB_Upper": bb_mid + self.bb_k * bb_std,
+            "BB_Lower": bb_mid - self.bb_k * bb_std,
+        }
+        for window_size, window in self.sma_windows.items():
+            result[f"SMA{window_size}"] = window.mean()
+        for span in self.ema_spans:
+            result[f"EMA{span}"] = self.ema[span]
+        return result
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import correlation
+import forecast
+import indicators
+
+# 画面（stock_app.py）とバッチ処理（batch_analyze.py）で共通の分析処理
+# Streamlit には依存しないので、どこからでも import して使える
+
+
+def calculate_rsi(data, window=14):
+    return pd.Series(indicators.rsi(data.values, window), index=data.index)
+
+
+def add_indicators(df):
+    """株価のDataFrameに RSI / 25MA / 75MA の列を足す"""
+    if len(df) > 0:
+        df['RSI'] = calculate_rsi(df['Close'])
+        df['SMA25'] = indicators.sma(df['Close'].values, 25)
+        df['SMA75'] = indicators.sma(df['Close'].values, 75)
+    return df
+
+
+def date_range(years, now=None):
+    """学習期間（年）から (開始日, 終了日) を返す"""
+    end_date = now or datetime.now()
+    return end_date - timedelta(days=years*365), end_date
+
+
+def load_price_frame(store, ticker, start_date, end_date, interval):
+    """株価を取得し、テクニカル指標の列を足して返す"""
+    return add_indicators(store.get_prices(ticker, start_date, end_date, interval))
+
+
+def summarize_info(info, fallback_name):
+    """企業情報から画面に出す基本データ（社名・PER・PBR・配当利回り）を取り出す"""
+    return {
+        "name": info.get('longName', fallback_name),
+        "PER": info.get('trailingPE'),
+        "PBR": info.get('priceToBook'),
+        "配当利回り": info.get('dividendYield'),
+    }
+
+
+def financials_frame(financials):
+    """決算（項目 × 期）を 期 × 項目 の時系列にする"""
+    return financials.T.sort_index()
+
+
+def run_forecast(df, days_predict, cache_dir=forecast.DEFAULT_CACHE_DIR):
+    """呼び出したプロセスの中でAI予測を行い、予測のDataFrameを返す"""
+    _, result = forecast.predict(forecast.make_prophet_frame(df), days_predict, cache_dir=cache_dir)
+    return result
+
+
+def growth_curves(closes):
+    """各銘柄の最初の終値を基準にした成長率（%）を、全銘柄まとめて計算する"""
+    if len(closes) == 0:
+        return closes
+    return (closes / closes.bfill().iloc[0] - 1) * 100
+
+
+def analyze_correlation(closes):
+    """騰落率の相関行列（似た動きの銘柄が隣り合う並び）、ローリングの窓、平均相関の推移を返す"""
+    # 株価そのものではなく騰落率どうしの相関を見る
+    returns = correlation.to_returns(closes)
+    corr_matrix = correlation.correlation_matrix(returns)
+    order = correlation.cluster_order(corr_matrix.values)
+    corr_matrix = corr_matrix.iloc[order, order]
+    window = min(60, max(10, len(returns) // 4))
+    return corr_matrix, window, correlation.rolling_mean_correlation(returns, window)
+
+
+def summary_row(ticker, name, df, info=None, forecast_df=None):
+    """1銘柄の分析結果を、レポートの1行にまとめる"""
+    row = {"コード": ticker, "銘柄名": name}
+    if info is not None:
+        # 文字列などが混ざっても表の列が数値のままになるように揃える
+        row.update({k: pd.to_numeric(v, errors="coerce") for k, v in summarize_info(info, name).items()
+                    if k != "name"})
+    if len(df) > 0:
+        latest = df.iloc[-1]
+        row.update({
+            "日付": df.index[-1], "終値": latest['Close'], "RSI": latest['RSI'],
+            "25MA": latest['SMA25'], "75MA": latest['SMA75'],
+        })
+    if forecast_df is not None and len(forecast_df) > 0:
+        last = forecast_df.iloc[-1]
+        row.update({"予測日": last['ds'], "予測値": last['yhat'],
+                    "予測下限": last['yhat_lower'], "予測上限": last['yhat_upper']})
+    return row
@@ -0,0 +1,284 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from resample import RESAMPLE_RULES, period_start, resample_ohlcv
+
+# 株価(OHLCV)をローカルのSQLiteに貯めておき、足りない期間だけ取りに行く仕組み
+# 同じ銘柄を何度分析しても、2回目以降はディスクから読むだけなので速い
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# 配当・分割の列（保存はしない。取り直した足にあれば、保存済みの調整後株価が古くなったと判断する）
+ACTION_COLUMNS = ["Dividends", "Stock Splits"]
+# 取り直した足の始値が保存済みの値とこれ以上ずれていたら、過去の調整が変わったとみなす
+ADJUSTMENT_TOLERANCE = 0.005
+DEFAULT_DB_PATH = "./price_cache.sqlite"
+# 当日の足は取引中に変わるので、最後に取得してからこの時間が過ぎたら取り直す
+DEFAULT_REFRESH_INTERVAL = timedelta(minutes=15)
+
+
+def _normalize_frame(df):
+    """yfinanceの戻り値を「日付インデックス + OHLCV列（+ 配当・分割の列）」の形にそろえる"""
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df[[c for c in OHLCV_COLUMNS + ACTION_COLUMNS if c in df.columns]].copy()
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.normalize()
+    df.index.name = "Date"
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def _has_business_days(start, end):
+    """start から end まで（end の日を含む）に平日が1日でもあるか"""
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize() + timedelta(days=1)
+    return bool(np.busday_count(start.date(), end.date()) > 0)
+
+
+class YahooFetcher:
+    """Yahoo Finance から取得する標準のフェッチャー
+
+    フェッチャーは fetch(ticker, start, end, interval) で
+    OHLCVのDataFrameを返すものなら何でも差し替えられる（テスト用の偽データなど）
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def fetch(self, ticker, start, end, interval):
+        # yf.download は内部で共有の辞書を使うので、並列で呼んでも安全な Ticker.history を使う
+        df = yf.Ticker(ticker).history(start=start, end=end, interval=interval, timeout=self.timeout)
+        return _normalize_frame(df)
+
+
+class PriceStore:
+    """銘柄 × 足ごとに株価を保存するローカルストア
+
+    取得済みの期間（coverage）を1本の連続した範囲として記録しておき、
+    要求された期間のうち範囲外の「頭」と「しっぽ」だけをフェッチャーに取りに行く。
+    範囲は常に連続なので、途中に穴（ギャップ）ができることはない。
+    範囲の終わりは「取得した時刻」までにしておき、当日の足は refresh_interval ごとに取り直す。
+
+    株価は配当・分割で調整された値（yfinanceの既定）を保存しているので、
+    取り直した足に新しい配当・分割があったり、最後の足の値が保存済みと食い違ったりしたら、
+    その銘柄の保存分を捨てて全期間を取り直す（調整前と調整後の値が混ざらないように）。
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, fetcher=None, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.fetcher = fetcher or YahooFetcher()
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            # 読み込みと書き込みが同時に走っても待たされにくいWALモードにしておく
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    ticker TEXT, interval TEXT, date TEXT,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (ticker, interval, date)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    ticker TEXT, interval TEXT, start TEXT, end TEXT,
+                    PRIMARY KEY (ticker, interval)
+                )""")
+
+    def _connect(self):
+        # スレッドごとに接続を作る（比較モードの並列取得でも安全に使えるように）
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _get_coverage(self, conn, ticker, interval):
+        row = conn.execute("SELECT start, end FROM coverage WHERE ticker = ? AND interval = ?",
+                           (ticker, interval)).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1])
+
+    def _last_bar_date(self, conn, ticker, interval, offset=0):
+        """保存済みの最後の足の日付（offset=1 ならその1本前）"""
+        row = conn.execute("SELECT date FROM bars WHERE ticker = ? AND interval = ? ORDER BY date DESC LIMIT 1 OFFSET ?",
+                           (ticker, interval, offset)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def _save(self, conn, ticker, interval, df):
+        dates = df.index.strftime("%Y-%m-%d")
+        columns = [
+            df[c].astype(float).where(df[c].notna(), None).tolist() if c in df.columns else [None] * len(df)
+            for c in OHLCV_COLUMNS
+        ]
+        rows = [(ticker, interval, d, *values) for d, *values in zip(dates, *columns)]
+        conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _adjustment_changed(self, conn, ticker, interval, frames):
+        """取り直した足を見て、保存済みの足の配当・分割の調整が古くなっていないかを返す"""
+        last_bar = self._last_bar_date(conn, ticker, interval)
+        if last_bar is None:
+            return False
+        for df in frames:
+            actions = df.loc[df.index > last_bar, [c for c in ACTION_COLUMNS if c in df.columns]]
+            if (actions.fillna(0) != 0).any().any():
+                return True
+            # 保存済みの足と重なる日（しっぽの取り直しの先頭）の始値を比べる
+            overlap = df.loc[df.index <= last_bar, "Open"] if "Open" in df.columns else ()
+            if len(overlap) == 0:
+                continue
+            stored = self._load(conn, ticker, interval, overlap.index[0], last_bar + timedelta(days=1))["Open"]
+            ratio = (overlap / stored.reindex(overlap.index)).dropna()
+            if ((ratio - 1).abs() > ADJUSTMENT_TOLERANCE).any():
+                return True
+        return False
+
+    def _missing_ranges(self, conn, ticker, interval, start, end):
+        """保存済みの範囲と比べて、取りに行くべき期間のリストと、今の保存済みの範囲を返す"""
+        coverage = self._get_coverage(conn, ticker, interval)
+        last_bar = self._last_bar_date(conn, ticker, interval) if coverage else None
+        if last_bar is None:
+            # 範囲だけ記録されていて足が1本もない（以前の取得失敗など）ときは、全期間を取り直す
+            return [(start, end)], None
+        lo, hi = coverage
+        ranges = []
+        if start < lo:
+            ranges.append((start, lo))
+        # 範囲の終わり（前回取得した時刻）から時間がたっていれば、最後の足から取り直す
+        # （最後の足はまだ確定していない可能性があるため）。その1本前も取り直して保存済みの値と比べ、
+        # 最後の足の日に配当・分割があって過去の調整が変わっていないかを確かめる
+        if end > hi and datetime.now() - hi >= self.refresh_interval:
+            previous_bar = self._last_bar_date(conn, ticker, interval, offset=1) or last_bar
+            ranges.append((min(hi, previous_bar), end))
+        return ranges, coverage
+
+    def get_prices(self, ticker, start, end, interval="1d"):
+        """指定期間のOHLCVを返す（足りない分だけ取得してから、ディスクから読む）
+
+        週足・月足は保存済みの日足から作るので、足を切り替えても通信は発生しない
+        """
+        if interval in RESAMPLE_RULES:
+            daily = self.get_prices(ticker, period_start(start, interval), end, "1d")
+            return resample_ohlcv(daily, interval)
+
+        start = pd.Timestamp(start).normalize().to_pydatetime()
+        end = pd.Timestamp(end).normalize().to_pydatetime() + timedelta(days=1)
+
+        with self._lock, self._connect() as conn:
+            ranges, coverage = self._missing_ranges(conn, ticker, interval, start, end)
+
+        # ネットワーク待ちの間はロックを持たない
+        fetched_at = datetime.now()
+        fetched = [_normalize_frame(self.fetcher.fetch(ticker, s, e, interval)) for s, e in ranges]
+
+        with self._lock, self._connect() as conn:
+            if not self._adjustment_changed(conn, ticker, interval, fetched):
+                for (s, e), df in zip(ranges, fetched):
+                    if len(df) == 0:
+                        # 空の結果は通信エラーの可能性があるので、取得済みとして記録しない（次回また取りに行く）
+                        continue
+                    self._save(conn, ticker, interval, df)
+                    # 取りに行く範囲は保存済みの範囲に隣接しているので、足しても途中に穴はできない
+                    # 未来の日付や取引中の足はまだ取れていないので、取得した時刻までを取得済みとする
+                    e = min(e, fetched_at)
+                    coverage = (s, e) if coverage is None else (min(s, coverage[0]), max(e, coverage[1]))
+                if coverage is not None:
+                    conn.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)",
+                                 (ticker, interval, coverage[0].isoformat(), coverage[1].isoformat()))
+                return self._load(conn, ticker, interval, start, end)
+            # 配当・分割で過去の株価の調整が変わったので、保存分を捨てて要求された全期間を取り直す
+            conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval))
+            conn.execute("DELETE FROM coverage WHERE ticker = ? AND interval = ?", (ticker, interval))
+        return self.get_prices(ticker, start, end - timedelta(days=1), interval)
+
+    def _load(self, conn, ticker, interval, start, end):
+        return self._load_many(conn, [ticker], interval, start, end).get(ticker, _normalize_frame(None))
+
+    def _load_many(self, conn, tickers, interval, start, end):
+        """複数銘柄を1回のクエリでまとめて読み込み、{銘柄: DataFrame} で返す"""
+        placeholders = ",".join("?" * len(tickers))
+        rows = conn.execute(
+            "SELECT ticker, date, open, high, low, close, volume FROM bars "
+            f"WHERE ticker IN ({placeholders}) AND interval = ? AND date >= ? AND date < ? "
+            "ORDER BY ticker, date",
+            (*tickers, interval, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")),
+        ).fetchall()
+        if not rows:
+            return {}
+        df = pd.DataFrame(rows, columns=["Ticker", "Date"] + OHLCV_COLUMNS)
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        df[OHLCV_COLUMNS] = df[OHLCV_COLUMNS].astype(float)
+        return {t: g.drop(columns="Ticker").set_index("Date") for t, g in df.groupby("Ticker", sort=False)}
+
+    def _get_prices_with_retry(self, ticker, start, end, interval, retries):
+        for attempt in range(retries + 1):
+            try:
+                df = self.get_prices(ticker, start, end, interval)
+                # Yahoo は通信エラーでも例外を出さずに空の表を返すので、営業日を含む期間なのに空ならやり直す
+                if len(df) > 0 or not _has_business_days(start, end) or attempt == retries:
+                    return df
+            except Exception:
+                if attempt == retries:
+                    raise
+            time.sleep(0.5 * (attempt + 1))
+
+    def get_frames(self, tickers, start, end, interval="1d",
+                   max_workers=8, retries=2, timeout=60):
+        """複数銘柄を並列取得し、({銘柄: OHLCVのDataFrame}, 取得できなかった銘柄のリスト) を返す
+
+        1銘柄ずつの待ち時間はフェッチャー側のタイムアウトで区切り、
+        全体でも timeout 秒を超えたら打ち切る。
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}, []
+        if interval in RESAMPLE_RULES:
+            frames, failed = self.get_frames(tickers, period_start(start, interval), end, "1d",
+                                             max_workers=max_workers, retries=retries, timeout=timeout)
+            return {t: resample_ohlcv(df, interval) for t, df in frames.items()}, failed
+
+        # 保存済みの範囲で足りる銘柄は、1回のクエリでまとめてディスクから読む
+        lo = pd.Timestamp(start).normalize().to_pydatetime()
+        hi = pd.Timestamp(end).normalize().to_pydatetime() + timedelta(days=1)
+        with self._lock, self._connect() as conn:
+            to_fetch = [t for t in tickers if self._missing_ranges(conn, t, interval, lo, hi)[0]]
+            cached = [t for t in tickers if t not in set(to_fetch)]
+            results = self._load_many(conn, cached, interval, lo, hi) if cached else {}
+
+        # 足りない銘柄だけを並列で取りに行く
+        if to_fetch:
+            executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(to_fetch))))
+            try:
+                futures = {
+                    executor.submit(self._get_prices_with_retry, t, start, end, interval, retries): t
+                    for t in to_fetch
+                }
+                done, _ = wait(futures, timeout=timeout)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            for future, ticker in futures.items():
+                if future in done and future.exception() is None:
+                    results[ticker] = future.result()
+
+        frames = {t: results[t] for t in tickers if t in results and len(results[t]) > 0}
+        failed = [t for t in tickers if t not in frames]
+        return frames, failed
+
+    def get_many(self, tickers, start, end, interval="1d", column="Close",
+                 max_workers=8, retries=2, timeout=60):
+        """複数銘柄をまとめて並列取得し、日付で揃えた横長のDataFrameを返す
+
+        戻り値は (列=銘柄 の DataFrame, 取得できなかった銘柄のリスト)
+        """
+        frames, failed = self.get_frames(tickers, start, end, interval,
+                                         max_workers=max_workers, retries=retries, timeout=timeout)
+        wide = pd.DataFrame({t: df[column] for t, df in frames.items()})
+        return wide.sort_index(), failed
@@ -0,0 +1,33 @@
+import pandas as pd
+
+# 週足・月足を日足から手元で作るモジュール（足を切り替えてもダウンロードし直さずに済む）
+# 日付は取引所の現地日付（東証なら日本時間）のまま扱う。PriceStore はタイムゾーンを
+# 外すときに現地の日付を保つので、UTCにずれて月曜の足が日曜に入る、といったことは起きない。
+# 祝日などで1日も取引がなかった週・月は、空の足を作らずに飛ばす。
+
+# Yahoo Finance と同じく、週足は月曜日、月足は1日の日付で表す
+RESAMPLE_RULES = {"1wk": "W-MON", "1mo": "MS"}
+
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def period_start(date, interval):
+    """date を含む週（月曜始まり）または月の初日を返す。最初の足が途中から始まらないようにするため"""
+    date = pd.Timestamp(date).normalize()
+    if interval == "1wk":
+        return date - pd.Timedelta(days=date.weekday())
+    if interval == "1mo":
+        return date.replace(day=1)
+    return date
+
+
+def resample_ohlcv(daily, interval):
+    """日足のOHLCVを週足・月足にまとめる（始値=最初, 高値=最大, 安値=最小, 終値=最後, 出来高=合計）"""
+    if interval not in RESAMPLE_RULES or len(daily) == 0:
+        return daily
+    agg = {c: f for c, f in OHLCV_AGG.items() if c in daily.columns}
+    bars = daily.resample(RESAMPLE_RULES[interval], label="left", closed="left").agg(agg)
+    # 取引日が1日もなかった期間は終値がNaNになるので落とす
+    bars = bars[daily['Close'].resample(RESAMPLE_RULES[interval], label="left", closed="left").count() > 0]
+    bars.index.name = daily.index.name
+    return bars
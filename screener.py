@@ -0,0 +1,125 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+# 銘柄リスト全体を一定数ずつのバッチに分けてスキャンし、条件に合う銘柄を探す
+# バッチごとに途中結果を返すので、画面には終わった分から順に表示できる
+
+DEFAULT_FILTERS = {
+    "rsi_max": None,          # RSIがこの値未満（例: 30）
+    "golden_cross": False,    # 直近 cross_lookback 本以内に25MAが75MAを上抜け
+    "cross_lookback": 5,
+    "volume_ratio_min": None, # 直近の出来高 ÷ 過去20本の平均出来高
+    "return_min": None,       # 騰落率(%)の下限・上限（return_days 本前との比較）
+    "return_max": None,
+    "return_days": 20,
+}
+
+# 1本の足がおよそ何日分か（祝日の分も少し多めに見込む）
+DAYS_PER_BAR = {"1d": 1.5, "1wk": 7, "1mo": 31}
+MIN_LOOKBACK_DAYS = 365
+RSI_WINDOW = 14
+
+RESULT_COLUMNS = ["コード", "銘柄名", "終値", "RSI", "SMA25", "SMA75", "GC", "出来高倍率", "騰落率(%)"]
+
+
+def lookback_days(interval="1d", filters=None):
+    """75MA・RSI・騰落率をすべて計算できるだけの本数がそろう取得期間（日数）
+
+    週足・月足は1本が長いので、日足と同じ期間では75MAが計算できない
+    """
+    f = dict(DEFAULT_FILTERS, **(filters or {}))
+    # 75MAに加えて、ゴールデンクロスを探す本数・騰落率の比較・出来高の平均の分と、少しの余裕
+    bars = 75 + max(f["cross_lookback"], f["return_days"], 20) + 10
+    return max(MIN_LOOKBACK_DAYS, int(bars * DAYS_PER_BAR.get(interval, 1)))
+
+
+def _right_align(values, valid):
+    """各列の有効な値を順番を保ったまま下詰めにする（休場日の違う銘柄を同じ配列で計算するため）"""
+    order = np.argsort(valid, axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0)
+
+
+def screen_frames(frames, universe, filters=None):
+    """{コード: OHLCV} をまとめて指標計算し、条件に合う銘柄の表を返す"""
+    f = dict(DEFAULT_FILTERS, **(filters or {}))
+    if not frames:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    codes = list(frames)
+    close = pd.DataFrame({c: frames[c]["Close"] for c in codes}).sort_index()
+    volume = pd.DataFrame({c: frames[c]["Volume"] for c in codes}).reindex(close.index)
+    valid = close.notna().values
+    x = _right_align(close.values, valid)
+    v = _right_align(volume.values, valid)
+
+    # 下詰めにした上の方はNaNの詰め物なので、銘柄ごとの本数が足りない指標は使わない
+    n_bars = valid.sum(axis=0)
+    rsi = indicators.rsi(x, RSI_WINDOW)[-1]
+    rsi[n_bars < RSI_WINDOW + 1] = np.nan
+    sma25 = indicators.sma(x, 25)
+    sma75 = indicators.sma(x, 75)
+    lookback = f["cross_lookback"]
+    above = sma25[-lookback - 1:] > sma75[-lookback - 1:]
+    # 75MAがNaNから計算できるようになった所を上抜けと数えないよう、比べる期間全体で75MAがそろう銘柄だけにする
+    golden_cross = (~above[:-1] & above[1:]).any(axis=0) & (n_bars >= 75 + lookback)
+
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # 出来高がすべてNaNの銘柄があると nanmean が警告を出すので黙らせる
+        warnings.simplefilter("ignore", RuntimeWarning)
+        volume_ratio = v[-1] / np.nanmean(v[-21:-1], axis=0) if len(v) > 1 else np.full(len(codes), np.nan)
+        n = f["return_days"]
+        base = x[-n - 1] if len(x) > n else np.full(len(codes), np.nan)
+        ret = (x[-1] / base - 1) * 100
+
+    mask = np.isfinite(x[-1])
+    if f["rsi_max"] is not None:
+        mask &= rsi < f["rsi_max"]
+    if f["golden_cross"]:
+        mask &= golden_cross
+    if f["volume_ratio_min"] is not None:
+        mask &= volume_ratio >= f["volume_ratio_min"]
+    if f["return_min"] is not None:
+        mask &= ret >= f["return_min"]
+    if f["return_max"] is not None:
+        mask &= ret <= f["return_max"]
+
+    rows = np.flatnonzero(mask)
+    return pd.DataFrame({
+        "コード": [codes[i] for i in rows],
+        "銘柄名": [universe.get_by_code(codes[i])["query"] for i in rows],
+        "終値": x[-1][rows],
+        "RSI": rsi[rows],
+        "SMA25": sma25[-1][rows],
+        "SMA75": sma75[-1][rows],
+        "GC": golden_cross[rows],
+        "出来高倍率": volume_ratio[rows],
+        "騰落率(%)": ret[rows],
+    }, columns=RESULT_COLUMNS)
+
+
+def scan(store, universe, start, end, interval="1d", filters=None,
+         batch_size=200, max_workers=16, time_budget=300):
+    """全銘柄をバッチごとにスキャンするジェネレーター
+
+    バッチが終わるたびに {"done", "total", "matches", "failed", "timed_out"} を返す。
+    time_budget 秒を超えたら、残りのバッチを打ち切って timed_out=True で終わる。
+    株価は PriceStore 経由で取るので、保存済みの期間はネットワークに出ない。
+    """
+    deadline = time.monotonic() + time_budget
+    codes = universe.codes
+    for i in range(0, len(codes), batch_size):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield {"done": i, "total": len(codes), "matches": pd.DataFrame(columns=RESULT_COLUMNS),
+                   "failed": [], "timed_out": True}
+            return
+        batch = codes[i:i + batch_size]
+        frames, failed = store.get_frames(batch, start, end, interval,
+                                          max_workers=max_workers, retries=1, timeout=remaining)
+        yield {"done": i + len(batch), "total": len(codes), "matches": screen_frames(frames, universe, filters),
+               "failed": failed, "timed_out": False}
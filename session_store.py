@@ -0,0 +1,54 @@
+from concurrent.futures import Future
+
+import streamlit as st
+
+# 計算結果をセッションごとに覚えておく入れ物
+# Streamlitはウィジェットを触るたびにスクリプトを頭から実行し直すので、
+# 「名前」ごとに (入力のキー, 結果) を1つだけ保存し、入力が同じなら計算せずに結果を返す。
+# 名前ごとに最新の1件しか持たないので、使い続けてもメモリは増えない。
+
+STATE_KEY = "_result_store"
+_MISSING = object()
+
+
+def _slots():
+    if STATE_KEY not in st.session_state:
+        st.session_state[STATE_KEY] = {}
+    return st.session_state[STATE_KEY]
+
+
+def get(name, key, default=None):
+    slot = _slots().get(name)
+    if slot is not None and slot[0] == key:
+        return slot[1]
+    return default
+
+
+def put(name, key, value):
+    _slots()[name] = (key, value)
+
+
+def memo(name, key, compute):
+    """入力(key)が前回と同じなら保存済みの結果を、違えば compute() の結果を保存して返す"""
+    value = get(name, key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        put(name, key, value)
+    return value
+
+
+def future(name, key, submit):
+    """保存済みなら完了済みの Future を、なければ submit() で投げた Future を返す
+
+    結果が出たら put() で保存するのは呼び出し側の仕事（エラーやタイムアウトは保存しないため）
+    """
+    value = get(name, key, _MISSING)
+    if value is _MISSING:
+        return submit()
+    done = Future()
+    done.set_result(value)
+    return done
+
+
+def clear():
+    _slots().clear()
@@ -1,13 +1,21 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
-from prophet import Prophet
 from prophet.plot import plot_plotly
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import feedparser
-import urllib.parse
+from price_store import PriceStore
+from forecast import ForecastService, make_prophet_frame
+from universe import Universe, load_universe
+import screener
+from feed_cache import FeedCache
+import chart_render
+import correlation
+import pipeline
+from concurrent.futures import ThreadPoolExecutor
+from fundamentals import FundamentalsCache, iter_completed
+import session_store
+import timing
 
 st.set_page_config(page_title="はまさんの神投資アプリ 🚀", layout="wide")
 st.title("God Mode: 完全日本語 & 詳細データ版 ⛩️")
@@ -15,56 +23,124 @@ st.title("God Mode: 完全日本語 & 詳細データ版 ⛩️")
 # --- サイドバー設定 ---
 st.sidebar.header("🛠 設定")
 
-app_mode = st.sidebar.radio("モード選択", ["詳細分析 (単一銘柄)", "パフォーマンス比較 (複数銘柄)"])
+app_mode = st.sidebar.radio("モード選択", ["詳細分析 (単一銘柄)", "パフォーマンス比較 (複数銘柄)", "スクリーナー (全銘柄)"])
 
 interval_map = {"日足 (1日)": "1d", "週足 (1週間)": "1wk", "月足 (1ヶ月)": "1mo"}
 selected_interval_label = st.sidebar.selectbox("チャートの足", options=interval_map.keys())
 interval = interval_map[selected_interval_label]
+# 相関の見出しに出す「何ごとのリターンか」
+return_period_labels = {"1d": "日次", "1wk": "週次", "1mo": "月次"}
 
-@st.cache_data
+# 今回の実行で各段階にかかった時間を記録する（サイドバーのデバッグ表示で確認できる）
+timer = timing.Timer("stock_app")
+
+@st.cache_resource
 def get_stock_list():
+    # xlsxはコンパイル済みの銘柄リストから読み込み、xlsxが変わったときだけ作り直す
     try:
-        df_jpx = pd.read_excel("./stock_list.xlsx")
-        stock_list = []
-        custom_stocks = [
-            ("AAPL", "Apple Inc", "米国株: Apple"),
-            ("NVDA", "NVIDIA Corp", "米国株: NVIDIA"),
-            ("MSFT", "Microsoft Corp", "米国株: Microsoft"),
-            ("TSLA", "Tesla Inc", "米国株: Tesla"),
-            ("GOOGL", "Alphabet Inc", "米国株: Google"),
-            ("AMZN", "Amazon.com", "米国株: Amazon"),
-        ]
-        for code, query, name in custom_stocks:
-            stock_list.append({"label": name, "code": code, "query": query})
-
-        for index, row in df_jpx.iterrows():
-            code = str(row.iloc[1])
-            name = str(row.iloc[2])
-            if code.isdigit() and len(code) == 4:
-                full_code = f"{code}.T"
-                stock_list.append({"label": f"{full_code}: {name}", "code": full_code, "query": name})
-        return stock_list
+        return load_universe("./stock_list.xlsx")
     except Exception as e:
-        return []
+        return Universe([], [], [])
+
+with timer.span("銘柄リストの読み込み"):
+    stocks = get_stock_list()
+
+@st.cache_resource
+def get_price_store():
+    # 取得済みの株価はローカルに保存して、足りない期間だけダウンロードする
+    return PriceStore()
+
+price_store = get_price_store()
+
+@st.cache_resource
+def get_forecast_service():
+    # Prophetの学習は別プロセスで行い、結果はディスクにキャッシュする
+    return ForecastService()
+
+forecast_service = get_forecast_service()
+
+@st.cache_resource
+def get_feed_cache():
+    # 同じ検索語のRSSはしばらく使い回し、期限切れ後も変更がなければ再ダウンロードしない
+    return FeedCache()
+
+def get_news(query, feed_cache=None):
+    # 別スレッドから呼ぶときは、メインスレッドで取り出したキャッシュを渡す
+    return (feed_cache or get_feed_cache()).get(query)[:5]
 
-stocks = get_stock_list()
+@st.cache_resource
+def get_fundamentals_cache():
+    # 企業情報・決算は四半期ごとにしか変わらないので、株価とは別に長めにキャッシュする
+    return FundamentalsCache()
 
-def calculate_rsi(data, window=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+@st.cache_resource
+def get_io_executor():
+    # 詳細分析で企業情報・決算・株価・ニュースを同時に取りに行くためのスレッド
+    return ThreadPoolExecutor(max_workers=8)
 
-def get_news(query):
-    encoded_query = urllib.parse.quote(query)
-    rss_url = f"https://news.google.com/rss/search?q={encoded_query}&hl=ja&gl=JP&ceid=JP:ja"
-    feed = feedparser.parse(rss_url)
-    return feed.entries[:5]
+# 取得ごとの待ち時間の上限（秒）。超えたらそのセクションだけエラー表示にする
+FETCH_TIMEOUTS = {"info": 15, "financials": 15, "prices": 30, "news": 10}
 
 def convert_df_to_csv(df):
     return df.to_csv().encode('utf-8-sig')
 
+def load_price_frame(ticker, start_date, end_date, interval):
+    # 株価の取得とテクニカル指標の計算をまとめて行う（別スレッドで動かす）
+    with timer.span("株価の取得"):
+        df = price_store.get_prices(ticker, start_date, end_date, interval)
+    with timer.span("テクニカル指標"):
+        return pipeline.add_indicators(df)
+
+def build_price_chart(df, interval_label):
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
+                        vertical_spacing=0.03, row_heights=[0.7, 0.3])
+
+    # 【変更】hovertextを日本語にカスタマイズ
+    # 長期間のチャートは画面の幅に収まる本数まで間引いてから送る
+    fig.add_trace(chart_render.candlestick_trace(
+        df,
+        name='株価',
+        hovertemplate="<b>日付</b>: %{x|%Y/%m/%d}<br><b>始値</b>: %{open}<br><b>高値</b>: %{high}<br><b>安値</b>: %{low}<br><b>終値</b>: %{close}<extra></extra>"
+    ), row=1, col=1)
+    
+    fig.add_trace(chart_render.line_trace(df.index, df['SMA25'], mode='lines', name='25MA', line=dict(color='#FFA500', width=1.5)), row=1, col=1)
+    fig.add_trace(chart_render.line_trace(df.index, df['SMA75'], mode='lines', name='75MA', line=dict(color='#00BFFF', width=1.5)), row=1, col=1)
+    fig.add_trace(chart_render.volume_trace(df, name='出来高', marker_color='rgba(200, 200, 200, 0.5)'), row=2, col=1)
+
+    fig.update_layout(
+        title=f"{interval_label}チャート (出来高付き)",
+        height=600, template="plotly_dark",
+        xaxis_rangeslider_visible=False, showlegend=True,
+        margin=dict(l=20, r=20, t=50, b=20)
+    )
+    chart_render.cap_payload(fig)
+    return fig
+
+def build_financials_chart(financials):
+    fin_df = pipeline.financials_frame(financials)
+    fig_fin = go.Figure()
+    if 'Total Revenue' in fin_df.columns:
+        fig_fin.add_trace(go.Bar(x=fin_df.index, y=fin_df['Total Revenue'], name='売上高', marker_color='#00CC96'))
+    if 'Net Income' in fin_df.columns:
+        fig_fin.add_trace(go.Bar(x=fin_df.index, y=fin_df['Net Income'], name='純利益', marker_color='#EF553B'))
+
+    fig_fin.update_layout(title="業績推移", barmode='group', height=500, template="plotly_dark")
+    return fig_fin
+
+def build_rsi_chart(df):
+    fig_rsi = go.Figure()
+    fig_rsi.add_trace(chart_render.line_trace(df.index, df['RSI'], name='RSI', line=dict(color='#AB63FA', width=2)))
+    fig_rsi.add_hrect(y0=70, y1=100, fillcolor="red", opacity=0.2, line_width=0, annotation_text="売りゾーン", annotation_position="top left")
+    fig_rsi.add_hrect(y0=0, y1=30, fillcolor="blue", opacity=0.2, line_width=0, annotation_text="買いゾーン", annotation_position="bottom left")
+    fig_rsi.update_layout(height=300, yaxis_range=[0, 100], template="plotly_dark", title="RSI推移 (70以上=赤 / 30以下=青)")
+    return fig_rsi
+
+def build_forecast_chart(df, days_predict):
+    m, forecast = forecast_service.submit(make_prophet_frame(df), days_predict).result()
+    fig_ai = plot_plotly(m, forecast)
+    fig_ai.update_layout(title="AI予測信頼区間", height=600, template="plotly_dark", xaxis_title="日付", yaxis_title="株価")
+    return fig_ai
+
 # ==========================================
 # 🅰️ 詳細分析モード
 # ==========================================
@@ -73,139 +149,153 @@ if app_mode == "詳細分析 (単一銘柄)":
     if not stocks:
         st.error("銘柄リスト読み込みエラー")
     else:
-        stock_labels = [s["label"] for s in stocks]
+        search_text = st.sidebar.text_input("コード・社名で絞り込み", "")
+        stock_labels = stocks.search(search_text) if search_text else stocks.labels
+        if not stock_labels:
+            st.sidebar.warning("該当する銘柄がありません")
+            stock_labels = stocks.labels
         selected_label = st.sidebar.selectbox("銘柄を検索・選択", options=stock_labels)
-        selected_data = next(s for s in stocks if s["label"] == selected_label)
-        ticker = selected_data["code"]
-        search_query = selected_data["query"]
+        selected_data = stocks.get(selected_label)
 
         years = st.sidebar.slider("学習期間(年)", 1, 5, 2)
         days_predict = st.sidebar.slider("予測期間(日)", 30, 365, 90)
 
         if st.sidebar.button("神分析を実行 ⚡"):
+            # 押した時点の条件を覚えておき、タブ切り替えやダウンロードで画面が再実行されても結果を出し続ける
+            st.session_state["detail_params"] = {
+                "ticker": selected_data["code"], "search_query": selected_data["query"],
+                "interval": interval, "interval_label": selected_interval_label,
+                "years": years, "days_predict": days_predict, "date": datetime.now().date(),
+            }
+
+        params = st.session_state.get("detail_params")
+        if params is not None:
+            ticker = params["ticker"]
+            search_query = params["search_query"]
             try:
                 with st.spinner(f'【{search_query}】を詳細分析中...'):
-                    stock_info = yf.Ticker(ticker)
-                    info = stock_info.info
-                    financials = stock_info.financials
-                    
-                    start_date = datetime.now() - timedelta(days=years*365)
-                    end_date = datetime.now()
-                    
-                    df = yf.download(ticker, start=start_date, end=end_date, interval=interval)
-                    
-                    if isinstance(df.columns, pd.MultiIndex):
-                        df.columns = df.columns.get_level_values(0)
-                    
-                    if len(df) == 0:
-                        st.error("データなし")
-                    else:
-                        df['RSI'] = calculate_rsi(df['Close'])
-                        df['SMA25'] = df['Close'].rolling(window=25).mean()
-                        df['SMA75'] = df['Close'].rolling(window=75).mean()
-                        latest_rsi = df['RSI'].iloc[-1]
-                        current_price = df['Close'].iloc[-1]
-
-                        long_name = info.get('longName', search_query)
-                        st.markdown(f"## 🏢 {long_name}")
-                        
-                        pe = info.get('trailingPE', '-')
-                        pb = info.get('priceToBook', '-')
-                        div = info.get('dividendYield', '-')
-                        if isinstance(div, (int, float)): div = f"{div*100:.2f}%"
-
-                        # 基本データ表示
-                        c1, c2, c3, c4 = st.columns(4)
-                        c1.metric("現在株価", f"{float(current_price):.2f}")
-                        c2.metric("PER", pe)
-                        c3.metric("PBR", pb)
-                        c4.metric("配当利回り", div)
-                        
-                        # --- 【新機能】本日の詳細データ（4本値） ---
-                        st.markdown("##### 📊 本日の詳細データ")
-                        latest_row = df.iloc[-1]
-                        d1, d2, d3, d4 = st.columns(4)
-                        d1.metric("始値 (Open)", f"{float(latest_row['Open']):.2f}")
-                        d2.metric("高値 (High)", f"{float(latest_row['High']):.2f}")
-                        d3.metric("安値 (Low)", f"{float(latest_row['Low']):.2f}")
-                        d4.metric("終値 (Close)", f"{float(latest_row['Close']):.2f}")
-                        # ----------------------------------------
-                        
-                        csv_data = convert_df_to_csv(df)
-                        st.download_button(label="📥 株価データをCSVでダウンロード", data=csv_data, file_name=f"{ticker}_data.csv", mime='text/csv')
-                        st.markdown("---")
-
-                        tab1, tab2, tab3 = st.tabs(["📈 実績チャート(Pro)", "💰 決算推移", "🤖 AI予測(Pro)"])
-                        
-                        with tab1:
-                            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
-                                                vertical_spacing=0.03, row_heights=[0.7, 0.3])
-
-                            # 【変更】hovertextを日本語にカスタマイズ
-                            fig.add_trace(go.Candlestick(
-                                x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'], 
-                                name='株価',
-                                hovertemplate="<b>日付</b>: %{x|%Y/%m/%d}<br><b>始値</b>: %{open}<br><b>高値</b>: %{high}<br><b>安値</b>: %{low}<br><b>終値</b>: %{close}<extra></extra>"
-                            ), row=1, col=1)
-                            
-                            fig.add_trace(go.Scatter(x=df.index, y=df['SMA25'], mode='lines', name='25MA', line=dict(color='#FFA500', width=1.5)), row=1, col=1)
-                            fig.add_trace(go.Scatter(x=df.index, y=df['SMA75'], mode='lines', name='75MA', line=dict(color='#00BFFF', width=1.5)), row=1, col=1)
-                            fig.add_trace(go.Bar(x=df.index, y=df['Volume'], name='出来高', marker_color='rgba(200, 200, 200, 0.5)'), row=2, col=1)
-
-                            fig.update_layout(
-                                title=f"{selected_interval_label}チャート (出来高付き)",
-                                height=600, template="plotly_dark",
-                                xaxis_rangeslider_visible=False, showlegend=True,
-                                margin=dict(l=20, r=20, t=50, b=20)
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                        
-                        with tab2:
-                            if financials is not None and not financials.empty:
-                                fin_df = financials.T.sort_index()
-                                fig_fin = go.Figure()
-                                if 'Total Revenue' in fin_df.columns:
-                                    fig_fin.add_trace(go.Bar(x=fin_df.index, y=fin_df['Total Revenue'], name='売上高', marker_color='#00CC96'))
-                                if 'Net Income' in fin_df.columns:
-                                    fig_fin.add_trace(go.Bar(x=fin_df.index, y=fin_df['Net Income'], name='純利益', marker_color='#EF553B'))
-
-                                fig_fin.update_layout(title="業績推移", barmode='group', height=500, template="plotly_dark")
-                                st.plotly_chart(fig_fin, use_container_width=True)
+                    start_date, end_date = pipeline.date_range(params["years"])
+
+                    # 各セクションの入力。ここが変わったセクションだけ計算し直す
+                    info_key = (ticker, params["date"])
+                    prices_key = (ticker, params["interval"], params["years"], params["date"])
+                    news_key = (search_query, datetime.now().strftime("%Y%m%d%H"))
+
+                    # 企業情報・決算・株価・ニュースを同時に取りに行き、届いたものから表示する
+                    # （前回と同じ条件なら、保存済みの結果がすぐに返る）
+                    fundamentals = get_fundamentals_cache()
+                    executor = get_io_executor()
+                    keys = {"info": info_key, "financials": info_key, "prices": prices_key, "news": news_key}
+                    futures = {
+                        "info": session_store.future("info", info_key, lambda: executor.submit(timer.wrap("企業情報の取得", fundamentals.get_info), ticker)),
+                        "financials": session_store.future("financials", info_key, lambda: executor.submit(timer.wrap("決算の取得", fundamentals.get_financials), ticker)),
+                        "prices": session_store.future("prices", prices_key, lambda: executor.submit(load_price_frame, ticker, start_date, end_date, params["interval"])),
+                        "news": session_store.future("news", news_key, lambda: executor.submit(timer.wrap("ニュース(RSS)の取得", get_news), search_query, get_feed_cache())),
+                    }
+
+                    # 表示する場所を先に確保しておく
+                    header_area = st.empty()
+                    header_area.markdown(f"## 🏢 {search_query}")
+                    c1, c2, c3, c4 = st.columns(4)
+                    price_box = st.container()
+                    # タブを切り替えたときだけ再実行し、開いているタブの中身だけを計算する
+                    tab1, tab2, tab3 = st.tabs(["📈 実績チャート(Pro)", "💰 決算推移", "🤖 AI予測(Pro)"],
+                                               key="detail_tabs", on_change="rerun")
+                    rsi_box = st.container()
+                    news_box = st.container()
+                    df = None
+
+                    for name, result, error in iter_completed(futures, FETCH_TIMEOUTS):
+                        if error is None:
+                            session_store.put(name, keys[name], result)
+
+                        if name == "info":
+                            info = result if error is None else {}
+                            summary = pipeline.summarize_info(info, search_query)
+                            header_area.markdown(f"## 🏢 {summary['name']}")
+
+                            pe = summary['PER'] if summary['PER'] is not None else '-'
+                            pb = summary['PBR'] if summary['PBR'] is not None else '-'
+                            div = summary['配当利回り'] if summary['配当利回り'] is not None else '-'
+                            if isinstance(div, (int, float)): div = f"{div*100:.2f}%"
+
+                            # 基本データ表示
+                            c2.metric("PER", pe)
+                            c3.metric("PBR", pb)
+                            c4.metric("配当利回り", div)
+                            if error is not None:
+                                c4.caption(f"企業情報の取得エラー: {error}")
+
+                        elif name == "financials":
+                            if tab2.open:
+                                with tab2:
+                                    financials = result
+                                    if error is not None:
+                                        st.warning(f"決算データの取得エラー: {error}")
+                                    elif financials is not None and not financials.empty:
+                                        fig_fin = session_store.memo("fig_financials", info_key, timer.wrap("図: 決算推移", lambda: build_financials_chart(financials)))
+                                        st.plotly_chart(fig_fin, use_container_width=True)
+                                    else:
+                                        st.info("決算データなし")
+
+                        elif name == "news":
+                            with news_box:
+                                st.markdown(f"### 📰 ニュース")
+                                news = result if error is None else []
+                                if news:
+                                    for n in news:
+                                        with st.expander(n.title):
+                                            st.markdown(f"[記事を読む]({n.link})")
+                                else:
+                                    st.info("ニュースなし")
+
+                        elif name == "prices":
+                            if error is not None:
+                                price_box.error(f"株価の取得エラー: {error}")
+                            elif len(result) == 0:
+                                price_box.error("データなし")
                             else:
-                                st.info("決算データなし")
+                                df = result
+                                latest_rsi = df['RSI'].iloc[-1]
+                                current_price = df['Close'].iloc[-1]
+                                c1.metric("現在株価", f"{float(current_price):.2f}")
+
+                                with price_box:
+                                    # --- 【新機能】本日の詳細データ（4本値） ---
+                                    st.markdown("##### 📊 本日の詳細データ")
+                                    latest_row = df.iloc[-1]
+                                    d1, d2, d3, d4 = st.columns(4)
+                                    d1.metric("始値 (Open)", f"{float(latest_row['Open']):.2f}")
+                                    d2.metric("高値 (High)", f"{float(latest_row['High']):.2f}")
+                                    d3.metric("安値 (Low)", f"{float(latest_row['Low']):.2f}")
+                                    d4.metric("終値 (Close)", f"{float(latest_row['Close']):.2f}")
+                                    # ----------------------------------------
+
+                                    csv_data = session_store.memo("csv_prices", prices_key, timer.wrap("CSV作成", lambda: convert_df_to_csv(df)))
+                                    # ダウンロードしてもスクリプトを再実行しない
+                                    st.download_button(label="📥 株価データをCSVでダウンロード", data=csv_data, file_name=f"{ticker}_data.csv", mime='text/csv', on_click="ignore")
+                                    st.markdown("---")
+
+                                if tab1.open:
+                                    with tab1:
+                                        fig = session_store.memo("fig_price", prices_key, timer.wrap("図: 株価チャート", lambda: build_price_chart(df, params["interval_label"])))
+                                        st.plotly_chart(fig, use_container_width=True)
 
+                                with rsi_box:
+                                    st.markdown("### 📊 RSI（過熱感）")
+                                    fig_rsi = session_store.memo("fig_rsi", prices_key, timer.wrap("図: RSI", lambda: build_rsi_chart(df)))
+                                    st.plotly_chart(fig_rsi, use_container_width=True)
+
+                    # AI予測はタブを開いたときだけ計算する（予測期間だけ変えた場合は学習済みモデルを使い回す）
+                    if tab3.open:
                         with tab3:
-                            data = df.reset_index()
-                            date_col = 'Date' if 'Date' in data.columns else 'Datetime'
-                            if date_col in data.columns:
-                                if pd.api.types.is_datetime64_any_dtype(data[date_col]):
-                                    data[date_col] = data[date_col].dt.tz_localize(None)
-                            df_p = data[[date_col, 'Close']].rename(columns={date_col: 'ds', 'Close': 'y'})
-                            m = Prophet()
-                            m.fit(df_p)
-                            future = m.make_future_dataframe(periods=days_predict)
-                            forecast = m.predict(future)
-                            
-                            fig_ai = plot_plotly(m, forecast)
-                            fig_ai.update_layout(title="AI予測信頼区間", height=600, template="plotly_dark", xaxis_title="日付", yaxis_title="株価")
-                            st.plotly_chart(fig_ai, use_container_width=True)
-
-                        st.markdown("### 📊 RSI（過熱感）")
-                        fig_rsi = go.Figure()
-                        fig_rsi.add_trace(go.Scatter(x=df.index, y=df['RSI'], name='RSI', line=dict(color='#AB63FA', width=2)))
-                        fig_rsi.add_hrect(y0=70, y1=100, fillcolor="red", opacity=0.2, line_width=0, annotation_text="売りゾーン", annotation_position="top left")
-                        fig_rsi.add_hrect(y0=0, y1=30, fillcolor="blue", opacity=0.2, line_width=0, annotation_text="買いゾーン", annotation_position="bottom left")
-                        fig_rsi.update_layout(height=300, yaxis_range=[0, 100], template="plotly_dark", title="RSI推移 (70以上=赤 / 30以下=青)")
-                        st.plotly_chart(fig_rsi, use_container_width=True)
-
-                        st.markdown(f"### 📰 ニュース")
-                        news = get_news(search_query)
-                        if news:
-                            for n in news:
-                                with st.expander(n.title):
-                                    st.markdown(f"[記事を読む]({n.link})")
-                        else:
-                            st.info("ニュースなし")
+                            if df is None:
+                                st.info("株価データがないため予測できません")
+                            else:
+                                with st.spinner("AI予測を計算中..."):
+                                    forecast_key = prices_key + (params["days_predict"],)
+                                    fig_ai = session_store.memo("fig_forecast", forecast_key, timer.wrap("AI予測", lambda: build_forecast_chart(df, params["days_predict"])))
+                                st.plotly_chart(fig_ai, use_container_width=True)
 
             except Exception as e:
                 st.error(f"エラー: {e}")
@@ -213,58 +303,174 @@ if app_mode == "詳細分析 (単一銘柄)":
 # ==========================================
 # 🅱️ パフォーマンス比較モード
 # ==========================================
-else:
+elif app_mode == "パフォーマンス比較 (複数銘柄)":
     st.header("⚖️ 銘柄パフォーマンス比較")
     if not stocks:
         st.error("リスト読み込みエラー")
     else:
-        stock_labels = [s["label"] for s in stocks]
+        stock_labels = stocks.labels
         selected_labels = st.multiselect("比較したい銘柄を選んでください", options=stock_labels, default=stock_labels[:3])
         compare_years = st.sidebar.slider("比較期間(年)", 1, 10, 1)
 
         if st.button("比較スタート 🏁"):
             if not selected_labels:
                 st.warning("銘柄を選択してください")
+                st.session_state.pop("compare_params", None)
             else:
-                try:
-                    with st.spinner('データ収集中...'):
-                        start_date = datetime.now() - timedelta(days=compare_years*365)
-                        end_date = datetime.now()
+                st.session_state["compare_params"] = {
+                    "labels": tuple(selected_labels), "interval": interval,
+                    "years": compare_years, "date": datetime.now().date(),
+                }
+
+        params = st.session_state.get("compare_params")
+        if params is not None:
+            try:
+                with st.spinner('データ収集中...'):
+                    start_date, end_date = pipeline.date_range(params["years"])
+                    compare_key = (params["labels"], params["interval"], params["years"], params["date"])
+
+                    def load_closes():
+                        targets = [stocks.get(label) for label in params["labels"]]
+                        names = {t["code"]: t["query"] for t in targets}
+                        # 選んだ銘柄をまとめて並列ダウンロードし、日付で揃えた1枚の表にする
+                        closes, failed = price_store.get_many(list(names), start_date, end_date, params["interval"])
+                        return closes.rename(columns=names), failed
+
+                    combined_df, failed = session_store.memo("compare_closes", compare_key, timer.wrap("株価の取得", load_closes))
+                    if failed:
+                        st.warning(f"取得できなかった銘柄: {', '.join(failed)}")
+
+                    # 間引きは表示する期間の中で行うので、期間を狭めればその範囲が細かく描かれる
+                    # （Plotlyのズームはブラウザの中だけで完結し、サーバーに通知されないため、期間はここで選ぶ）
+                    view = None
+                    if len(combined_df) > 1:
+                        first_day, last_day = combined_df.index[0].date(), combined_df.index[-1].date()
+                        if first_day < last_day:
+                            view = st.slider("表示期間", min_value=first_day, max_value=last_day, value=(first_day, last_day))
+
+                    def build_comparison_chart():
                         fig_comp = go.Figure()
-                        combined_df = pd.DataFrame()
-                        
-                        for label in selected_labels:
-                            target = next(s for s in stocks if s["label"] == label)
-                            code = target["code"]
-                            name = target["query"]
-                            df = yf.download(code, start=start_date, end=end_date, interval=interval)
-                            if isinstance(df.columns, pd.MultiIndex):
-                                df.columns = df.columns.get_level_values(0)
-                            if len(df) > 0:
-                                initial_price = df['Close'].iloc[0]
-                                df['Return'] = ((df['Close'] / initial_price) - 1) * 100
-                                fig_comp.add_trace(go.Scatter(x=df.index, y=df['Return'], mode='lines', name=f"{name}"))
-                                combined_df[name] = df['Close']
+                        returns_df = pipeline.growth_curves(combined_df)
+                        if view is not None:
+                            returns_df = returns_df.loc[pd.Timestamp(view[0]):pd.Timestamp(view[1])]
+                        if len(returns_df) > 0:
+                            for name in returns_df.columns:
+                                ret = returns_df[name].dropna()
+                                fig_comp.add_trace(chart_render.line_trace(ret.index, ret, mode='lines', name=f"{name}"))
 
                         fig_comp.update_layout(title=f"成長率比較 (%) - Dark Mode", height=600, hovermode="x unified", template="plotly_dark")
                         fig_comp.add_hline(y=0, line_dash="dash", line_color="gray")
-                        st.plotly_chart(fig_comp, use_container_width=True)
-
-                        if len(combined_df.columns) > 1:
-                            csv_comp = convert_df_to_csv(combined_df)
-                            st.download_button(label="データをダウンロード", data=csv_comp, file_name="comparison.csv", mime='text/csv')
-
-                            st.markdown("### 🧩 相関ヒートマップ")
-                            corr_matrix = combined_df.corr()
-                            fig_heat = go.Figure(data=go.Heatmap(
-                                z=corr_matrix.values, x=corr_matrix.columns, y=corr_matrix.index,
-                                colorscale='RdBu_r', zmin=-1, zmax=1,
-                                text=corr_matrix.values, texttemplate="%{text:.2f}"
-                            ))
-                            fig_heat.update_layout(height=600, template="plotly_dark")
-                            st.plotly_chart(fig_heat, use_container_width=True)
-                        else:
-                            st.info("※2つ以上選んでください")
-
-                except Exception as e:
-                    st.error(f"比較エラー: {e}")
\ No newline at end of file
+                        # 銘柄が多いと点の合計が膨らむので、図全体のサイズに上限をかける
+                        chart_render.cap_payload(fig_comp)
+                        return fig_comp
+
+                    st.plotly_chart(session_store.memo("fig_compare", (compare_key, view), timer.wrap("図: 成長率比較", build_comparison_chart)), use_container_width=True)
+
+                    if len(combined_df.columns) > 1:
+                        csv_comp = session_store.memo("csv_compare", compare_key, timer.wrap("CSV作成", lambda: convert_df_to_csv(combined_df)))
+                        st.download_button(label="データをダウンロード", data=csv_comp, file_name="comparison.csv", mime='text/csv', on_click="ignore")
+
+                        corr_matrix, window, mean_corr = session_store.memo(
+                            "compare_corr", compare_key, timer.wrap("相関の計算", lambda: pipeline.analyze_correlation(combined_df)))
+
+                        st.markdown(f"### 🧩 相関ヒートマップ ({return_period_labels[params['interval']]}リターン)")
+                        # 銘柄が多いと数字が読めないので、少ないときだけマスに数字を出す
+                        show_text = len(corr_matrix) <= 20
+                        fig_heat = go.Figure(data=go.Heatmap(
+                            z=corr_matrix.values, x=corr_matrix.columns, y=corr_matrix.index,
+                            colorscale='RdBu_r', zmin=-1, zmax=1,
+                            text=corr_matrix.values if show_text else None,
+                            texttemplate="%{text:.2f}" if show_text else None
+                        ))
+                        fig_heat.update_layout(height=min(1200, max(600, 15 * len(corr_matrix))), template="plotly_dark")
+                        st.plotly_chart(fig_heat, use_container_width=True)
+
+                        p1, p2 = st.columns(2)
+                        p1.markdown("##### 🔗 相関が高いペア")
+                        p1.dataframe(correlation.top_pairs(corr_matrix, 10), use_container_width=True, hide_index=True)
+                        p2.markdown("##### ↔️ 相関が低いペア")
+                        p2.dataframe(correlation.top_pairs(corr_matrix, 10, largest=False), use_container_width=True, hide_index=True)
+
+                        st.markdown(f"##### 📉 平均相関の推移 ({window}本ローリング)")
+                        fig_roll = go.Figure(chart_render.line_trace(mean_corr.index, mean_corr, mode='lines', name='平均相関', line=dict(color='#FFA15A', width=2)))
+                        fig_roll.update_layout(height=300, yaxis_range=[-1, 1], template="plotly_dark")
+                        st.plotly_chart(fig_roll, use_container_width=True)
+                    else:
+                        st.info("※2つ以上選んでください")
+
+            except Exception as e:
+                st.error(f"比較エラー: {e}")
+
+# ==========================================
+# 🅲 スクリーナーモード
+# ==========================================
+else:
+    st.header("🔍 全銘柄スクリーナー")
+    if not stocks:
+        st.error("リスト読み込みエラー")
+    else:
+        st.sidebar.markdown("##### 🎯 スクリーニング条件")
+        use_rsi = st.sidebar.checkbox("RSIが指定値未満", value=True)
+        rsi_max = st.sidebar.slider("RSIの上限", 5, 50, 30, disabled=not use_rsi)
+        golden_cross = st.sidebar.checkbox("ゴールデンクロス (25MAが75MAを上抜け)")
+        use_volume = st.sidebar.checkbox("出来高急増")
+        volume_ratio_min = st.sidebar.slider("出来高倍率 (過去20本平均比)", 1.0, 10.0, 2.0, 0.5, disabled=not use_volume)
+        use_return = st.sidebar.checkbox("騰落率で絞り込み")
+        return_range = st.sidebar.slider("騰落率(%) (20本前比)", -50, 50, (-10, 10), disabled=not use_return)
+        time_budget = st.sidebar.slider("制限時間(秒)", 30, 600, 180)
+
+        filters = {
+            "rsi_max": rsi_max if use_rsi else None,
+            "golden_cross": golden_cross,
+            "volume_ratio_min": volume_ratio_min if use_volume else None,
+            "return_min": return_range[0] if use_return else None,
+            "return_max": return_range[1] if use_return else None,
+        }
+
+        if st.button("スキャン開始 🔍"):
+            # 75MAを計算できるだけの期間を、足の長さに合わせて取る（保存済みの株価はディスクから読むだけ）
+            start_date = datetime.now() - timedelta(days=screener.lookback_days(interval, filters))
+            end_date = datetime.now()
+            progress = st.progress(0, text="スキャン中...")
+            table_area = st.empty()
+            parts = []
+            failed = []
+            timed_out = False
+            with timer.span("スキャン"):
+                for result in screener.scan(price_store, stocks, start_date, end_date, interval,
+                                            filters=filters, time_budget=time_budget):
+                    parts.append(result["matches"])
+                    failed.extend(result["failed"])
+                    timed_out = result["timed_out"]
+                    matches = pd.concat(parts, ignore_index=True)
+                    progress.progress(result["done"] / result["total"],
+                                      text=f"スキャン中... {result['done']}/{result['total']}銘柄 ({len(matches)}件ヒット)")
+                    table_area.dataframe(matches, use_container_width=True, hide_index=True)
+            progress.empty()
+            table_area.empty()
+            st.session_state["screener_results"] = matches
+            st.session_state["screener_status"] = (result["done"], result["total"], len(failed), timed_out)
+
+        if "screener_results" in st.session_state:
+            results = st.session_state["screener_results"]
+            done, total, n_failed, timed_out = st.session_state["screener_status"]
+            if timed_out:
+                st.warning(f"制限時間に達したため {done}/{total} 銘柄で打ち切りました")
+            st.caption(f"{done}/{total} 銘柄をスキャン / {len(results)}件ヒット / 取得失敗 {n_failed}件")
+
+            if len(results) == 0:
+                st.info("条件に合う銘柄はありませんでした")
+            else:
+                s1, s2, s3 = st.columns(3)
+                sort_key = s1.selectbox("並び替え", options=screener.RESULT_COLUMNS, index=screener.RESULT_COLUMNS.index("RSI"))
+                ascending = s2.radio("順序", ["昇順", "降順"], horizontal=True) == "昇順"
+                page_size = 50
+                n_pages = (len(results) - 1) // page_size + 1
+                page = s3.number_input(f"ページ (全{n_pages}ページ)", min_value=1, max_value=n_pages, value=1)
+                sorted_results = results.sort_values(sort_key, ascending=ascending, ignore_index=True)
+                st.dataframe(sorted_results.iloc[(page - 1) * page_size:page * page_size],
+                             use_container_width=True, hide_index=True)
+                csv_screen = convert_df_to_csv(sorted_results)
+                st.download_button(label="📥 結果をCSVでダウンロード", data=csv_screen, file_name="screener.csv", mime='text/csv', on_click="ignore")
+
+timing.debug_panel(timer, "stock_app_timing.json")
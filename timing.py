@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+# 処理のどこに時間がかかっているかを測るための簡単な計測器
+# with timer.span("名前"): で囲んだ区間の開始時刻と所要時間を記録する。
+# 別スレッドで動く処理は timer.wrap("名前", 関数) で包めば、そのスレッドでの所要時間が記録される。
+# 記録するだけなら数マイクロ秒しかかからないので、デバッグ表示をオフにしていても常に計測しておく。
+
+LAST_RUN_KEY = "_timing_last_run"
+HISTORY_KEY = "_timing_history"
+HISTORY_SIZE = 10
+
+
+class Timer:
+    """1回の実行（Streamlitなら1回のスクリプト実行）分の計測結果を持つ"""
+
+    def __init__(self, label=""):
+        self.label = label
+        self.created_at = datetime.now()
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name):
+        """囲んだ区間を計測する。入れ子にすると「親/子」の名前で記録される"""
+        stack = self._stack()
+        stack.append(name)
+        path = "/".join(stack)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            with self._lock:
+                self.spans.append({
+                    "name": path,
+                    "start": round(start - self._origin, 6),
+                    "seconds": round(end - start, 6),
+                    "thread": threading.current_thread().name,
+                    "error": error,
+                })
+
+    def wrap(self, name, fn):
+        """fn を呼んだスレッドで span(name) を取るように包む（スレッドプールに投げる処理用）"""
+        def wrapped(*args, **kwargs):
+            with self.span(name):
+                return fn(*args, **kwargs)
+        return wrapped
+
+    def total(self):
+        return time.perf_counter() - self._origin
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        return {
+            "label": self.label,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "total_seconds": round(self.total(), 6),
+            "spans": spans,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+
+def debug_panel(timer, file_name="timing.json"):
+    """サイドバーに計測結果を出す。スクリプトの最後に呼ぶ
+
+    表示を切り替えたときの再実行は計測するものがほとんどないので、直近 HISTORY_SIZE 回分を残しておき、
+    見たい回を選べるようにする。最新の結果は session_state にも残すので、ベンチマークなどから読み出せる。
+    """
+    history = st.session_state.setdefault(HISTORY_KEY, [])
+    run = dict(timer.to_dict(), run_id=history[0]["run_id"] + 1 if history else 1)
+    st.session_state[LAST_RUN_KEY] = run
+    history.insert(0, run)
+    del history[HISTORY_SIZE:]
+
+    if not st.sidebar.toggle("⏱ 処理時間を表示 (デバッグ)", key="_timing_debug"):
+        return
+    with st.sidebar.expander("⏱ 処理時間", expanded=True):
+        runs = {r["run_id"]: r for r in history}
+        # 選んだ回は番号で覚えておく（表示を切り替えるたびに新しい回が先頭に増えるため）
+        run_id = st.selectbox("実行", options=list(runs), key="_timing_run",
+                              format_func=lambda i: f"#{i} {runs[i]['created_at'][11:]}  "
+                                                    f"{runs[i]['total_seconds']:.2f}秒 / {len(runs[i]['spans'])}区間")
+        selected = runs[run_id]
+        if not selected["spans"]:
+            st.caption("計測した区間はありません")
+        else:
+            df = pd.DataFrame(selected["spans"])
+            st.dataframe(df[["name", "start", "seconds", "thread"]], use_container_width=True, hide_index=True)
+        st.download_button("📥 JSONで保存", data=json.dumps(selected, ensure_ascii=False, indent=2).encode("utf-8"),
+                           file_name=file_name, mime="application/json", on_click="ignore")
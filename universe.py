@@ -0,0 +1,134 @@
+import bisect
+import difflib
+import json
+import os
+import unicodedata
+
+import pandas as pd
+
+# stock_list.xlsx を毎回パースしないように、銘柄リストを列ごとのJSONに「コンパイル」して保存しておく
+# xlsx が更新されたとき（更新日時かサイズが変わったとき）だけ作り直す
+
+DEFAULT_XLSX_PATH = "./stock_list.xlsx"
+DEFAULT_CACHE_PATH = "./stock_list.universe.json"
+ARTIFACT_VERSION = 1
+
+CUSTOM_STOCKS = [
+    ("AAPL", "Apple Inc", "米国株: Apple"),
+    ("NVDA", "NVIDIA Corp", "米国株: NVIDIA"),
+    ("MSFT", "Microsoft Corp", "米国株: Microsoft"),
+    ("TSLA", "Tesla Inc", "米国株: Tesla"),
+    ("GOOGL", "Alphabet Inc", "米国株: Google"),
+    ("AMZN", "Amazon.com", "米国株: Amazon"),
+]
+
+
+def _normalize(text):
+    # 全角・半角やアルファベットの大小を揃えて検索しやすくする
+    return unicodedata.normalize("NFKC", str(text)).lower().strip()
+
+
+class Universe:
+    """銘柄リスト。コード・ラベル・検索名を列ごとに持ち、辞書でO(1)に引ける"""
+
+    def __init__(self, codes, labels, queries):
+        self.codes = list(codes)
+        self.labels = list(labels)
+        self.queries = list(queries)
+        self.by_code = {c: i for i, c in enumerate(self.codes)}
+        self.by_label = {l: i for i, l in enumerate(self.labels)}
+
+        # 前方一致検索用に、(正規化した文字列, 行番号) をソートして持っておく
+        keys = []
+        for i, (code, query) in enumerate(zip(self.codes, self.queries)):
+            keys.append((_normalize(code), i))
+            keys.append((_normalize(query), i))
+        keys.sort()
+        self._search_keys = [k for k, _ in keys]
+        self._search_rows = [i for _, i in keys]
+        self._names = {}
+        for i, query in enumerate(self.queries):
+            self._names.setdefault(_normalize(query), i)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def _row(self, i):
+        return {"label": self.labels[i], "code": self.codes[i], "query": self.queries[i]}
+
+    def get(self, label):
+        """ラベルから銘柄（label / code / query の辞書）を返す"""
+        return self._row(self.by_label[label])
+
+    def get_by_code(self, code):
+        return self._row(self.by_code[code])
+
+    def search(self, text, limit=50):
+        """コードか銘柄名で検索する。前方一致 → 部分一致 → あいまい一致の順に並べて返す"""
+        q = _normalize(text)
+        if not q:
+            return []
+        found = []
+
+        start = bisect.bisect_left(self._search_keys, q)
+        for k in range(start, len(self._search_keys)):
+            if not self._search_keys[k].startswith(q):
+                break
+            found.append(self._search_rows[k])
+
+        if len(found) < limit:
+            found.extend(i for name, i in self._names.items() if q in name)
+        if len(found) < limit:
+            for name in difflib.get_close_matches(q, self._names.keys(), n=limit, cutoff=0.6):
+                found.append(self._names[name])
+
+        labels = []
+        for i in dict.fromkeys(found):
+            labels.append(self.labels[i])
+            if len(labels) >= limit:
+                break
+        return labels
+
+
+def _fingerprint(xlsx_path):
+    st = os.stat(xlsx_path)
+    return {"version": ARTIFACT_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def compile_universe(xlsx_path=DEFAULT_XLSX_PATH):
+    """xlsx を読み込んで列ごとの辞書にする（iterrows を使わずに列単位で処理する）"""
+    df = pd.read_excel(xlsx_path, usecols=[1, 2], dtype=str)
+    codes, names = df.iloc[:, 0].fillna("").str.strip(), df.iloc[:, 1].fillna("")
+    mask = codes.str.fullmatch(r"\d{4}")
+    full_codes = codes[mask] + ".T"
+    names = names[mask]
+
+    return {
+        "codes": [c for c, _, _ in CUSTOM_STOCKS] + full_codes.tolist(),
+        "labels": [label for _, _, label in CUSTOM_STOCKS] + (full_codes + ": " + names).tolist(),
+        "queries": [q for _, q, _ in CUSTOM_STOCKS] + names.tolist(),
+    }
+
+
+def load_universe(xlsx_path=DEFAULT_XLSX_PATH, cache_path=DEFAULT_CACHE_PATH):
+    """コンパイル済みの銘柄リストを読み込む。xlsx が変わっていれば作り直して保存する"""
+    fingerprint = _fingerprint(xlsx_path)
+    columns = None
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            artifact = json.load(f)
+        if artifact.get("fingerprint") == fingerprint:
+            columns = artifact["columns"]
+
+    if columns is None:
+        columns = compile_universe(xlsx_path)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "columns": columns}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+    return Universe(columns["codes"], columns["labels"], columns["queries"])